@@ -0,0 +1,9 @@
+import os
+
+from django.apps import AppConfig
+
+
+class OutpostConfig(AppConfig):
+    name = "outpost.django"
+    label = "outpost"
+    path = os.path.dirname(os.path.abspath(__file__))
@@ -1,6 +1,8 @@
+import asyncio
 import logging
 import os
-from importlib import import_module
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import django
 
@@ -9,36 +11,108 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "outpost.django.settings")
 django.setup()
 
 from a2wsgi import WSGIMiddleware
+from asgiref.sync import (
+    SyncToAsync,
+    ThreadSensitiveContext,
+)
 from channels.auth import AuthMiddlewareStack
 from channels.routing import (
     ChannelNameRouter,
     ProtocolTypeRouter,
     URLRouter,
 )
-from django.apps import apps
-
-# from django.core.asgi import get_asgi_application
+from django.conf import settings
+from django.core.asgi import get_asgi_application
 from django.core.wsgi import get_wsgi_application
 
+from . import routing
+
 logger = logging.getLogger(__name__)
 
-# django_asgi_app = get_asgi_application()
-django_asgi_app = WSGIMiddleware(get_wsgi_application())
-
-urls = list()
-worker = dict()
-
-for app in sorted(apps.get_app_configs(), key=lambda app: app.label):
-    try:
-        logger.debug(f"Looking for channels in {app.name}")
-        module = import_module(f"{app.name}.channels")
-        urls.extend(getattr(module, "urls", []))
-        worker.update({k: v for k, v in getattr(module, "worker", {}).items()})
-    except ModuleNotFoundError:
-        pass
-    except Exception:
-        logger.warn(f"Failed to import channels from {app.name}")
-        pass
+
+class ThreadLimit:
+    """
+    Run the sync parts of HTTP requests handled by the native Django ASGI
+    handler, i.e. sync middleware, views and signals, on a pool of
+    ``threads`` threads instead of the single thread asgiref uses by default.
+
+    Each request is bound to one thread of the pool for its whole lifetime,
+    like with a WSGI server, and waits for a free thread if all are busy. The
+    default executor of the event loop is sized accordingly.
+    """
+
+    def __init__(self, app, threads):
+        self.app = app
+        self.threads = threads
+        self.loop = None
+        self.lanes = deque()
+        self.waiters = deque()
+        self.executors = list()
+
+    def setup(self, loop):
+        for executor in self.executors:
+            executor.shutdown(wait=False)
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.threads))
+        self.loop = loop
+        self.lanes = deque()
+        self.waiters = deque()
+        self.executors = list()
+        for _ in range(self.threads):
+            # Thread sensitive sync_to_async() calls use the executor
+            # registered for the context they run in.
+            lane = ThreadSensitiveContext()
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asgi")
+            SyncToAsync.context_to_thread_executor[lane] = executor
+            self.executors.append(executor)
+            self.lanes.append(lane)
+
+    async def acquire(self):
+        if self.lanes and not self.waiters:
+            return self.lanes.popleft()
+        # Hand out threads in order of arrival.
+        waiter = self.loop.create_future()
+        self.waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(waiter.result())
+            raise
+
+    def release(self, lane):
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(lane)
+                return
+        self.lanes.append(lane)
+
+    async def __call__(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.setup(loop)
+        lane = await self.acquire()
+        token = SyncToAsync.thread_sensitive_context.set(lane)
+        try:
+            return await self.app(scope, receive, send)
+        finally:
+            SyncToAsync.thread_sensitive_context.reset(token)
+            self.release(lane)
+
+
+def http_application(native=None, threads=None):
+    if native is None:
+        native = getattr(settings, "ASGI_NATIVE_HTTP", False)
+    if threads is None:
+        threads = getattr(settings, "ASGI_THREADS", 10)
+    if native:
+        return ThreadLimit(get_asgi_application(), threads)
+    return WSGIMiddleware(get_wsgi_application(), workers=threads)
+
+
+django_asgi_app = http_application()
+
+urls, worker = routing.load()
 
 application = ProtocolTypeRouter(
     {
@@ -0,0 +1,299 @@
+import asyncio
+import logging
+import os
+import threading
+import uuid
+
+from django.core.cache import InvalidCacheBackendError
+from django.core.cache.backends.base import (
+    DEFAULT_TIMEOUT,
+    BaseCache,
+)
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class Broadcast:
+    """
+    Publishes invalidated cache keys to a channel layer group and hands the
+    keys published by other processes to ``callback``.
+
+    The channel layer is used from an event loop running in a background
+    thread, so publishing never waits for the layer. It is started again in
+    forked processes.
+    """
+
+    refresh = 3600
+    retry = 5
+
+    def __init__(self, alias, group, callback):
+        self.alias = alias
+        self.group = group
+        self.callback = callback
+        self.layer = None
+        self.loop = None
+        self.origin = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        if self.pid == os.getpid():
+            return self.loop is not None
+        with self.lock:
+            if self.pid == os.getpid():
+                return self.loop is not None
+            self.pid = os.getpid()
+            self.origin = uuid.uuid4().hex
+            self.loop = None
+            try:
+                from channels.layers import get_channel_layer
+
+                self.layer = get_channel_layer(self.alias)
+            except Exception:
+                logger.warning(
+                    f"Unable to use channel layer {self.alias} for cache "
+                    f"invalidation, local caches may be stale for their timeout",
+                    exc_info=True,
+                )
+                return False
+            if self.layer is None:
+                return False
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=self.loop.run_until_complete,
+                args=(self.listen(),),
+                name=f"{self.__class__.__name__}-{self.group}",
+                daemon=True,
+            ).start()
+            return True
+
+    async def listen(self):
+        while True:
+            try:
+                channel = await self.layer.new_channel()
+                while True:
+                    # Group memberships expire, renew them every now and then.
+                    await self.layer.group_add(self.group, channel)
+                    try:
+                        message = await asyncio.wait_for(
+                            self.layer.receive(channel), self.refresh
+                        )
+                    except asyncio.TimeoutError:
+                        continue
+                    if message.get("origin") != self.origin:
+                        self.callback(message.get("keys"))
+            except Exception:
+                logger.warning(
+                    f"Lost cache invalidation group {self.group}", exc_info=True
+                )
+                await asyncio.sleep(self.retry)
+
+    def publish(self, keys):
+        """
+        Publish ``keys`` as a list of ``(key, version)`` pairs or ``None`` to
+        clear the whole cache.
+        """
+        if not self.start():
+            return
+        asyncio.run_coroutine_threadsafe(
+            self.layer.group_send(
+                self.group,
+                {"type": "cache.invalidate", "origin": self.origin, "keys": keys},
+            ),
+            self.loop,
+        )
+
+
+broadcasts = dict()
+broadcasts_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    """
+    Cache backend keeping recently used entries in a bounded per-process LRU
+    cache in front of a shared cache.
+
+    Options:
+
+    ``SHARED``
+        Configuration of the shared cache like an entry of ``CACHES``, usually
+        Redis. A ``FileBasedCache`` or a ``DatabaseCache`` on SQLite can be
+        used for tests.
+    ``LOCAL``
+        Configuration of the per-process ``LocMemCache``. Its ``TIMEOUT``
+        caps how long entries are kept locally and ``MAX_ENTRIES`` bounds its
+        size. Entries read from the shared cache are never kept longer than
+        their remaining timeout there, which needs a shared backend with
+        ``ttl()`` like django-redis. Otherwise only entries written by the
+        process itself are kept locally.
+    ``CHANNEL_LAYER``
+        Alias of the channel layer used to broadcast invalidations to the
+        local caches of other processes, ``None`` to disable them.
+    ``GROUP``
+        Channel layer group for invalidations, unique for each cache.
+
+    Broadcasts are asynchronous, so other processes may return a previous
+    value for a short moment after it was changed. Each process subscribes on
+    its first access to the cache.
+    """
+
+    def __init__(self, location, params):
+        options = params.get("OPTIONS", {})
+        super().__init__(params)
+        shared = dict(options.get("SHARED", {}))
+        try:
+            backend = import_string(shared.pop("BACKEND"))
+        except (ImportError, KeyError) as e:
+            raise InvalidCacheBackendError(
+                f"Could not find shared backend for {self.__class__.__name__}: {e}"
+            ) from e
+        self.shared = backend(shared.pop("LOCATION", ""), shared)
+        self.group = options.get("GROUP", "outpost.cache")
+        local = {"TIMEOUT": 60, "OPTIONS": {"MAX_ENTRIES": 1000}}
+        local.update(options.get("LOCAL", {}))
+        # All instances of the same cache in a process share their entries.
+        self.local = LocMemCache(self.group, local)
+        alias = options.get("CHANNEL_LAYER", "default")
+        self.broadcast = None
+        if alias is not None:
+            with broadcasts_lock:
+                if self.group not in broadcasts:
+                    broadcasts[self.group] = Broadcast(
+                        alias, self.group, self.invalidate
+                    )
+                self.broadcast = broadcasts[self.group]
+
+    def invalidate(self, keys):
+        if keys is None:
+            self.local.clear()
+            return
+        for key, version in keys:
+            self.local.delete(key, version)
+
+    def subscribe(self):
+        if self.broadcast is not None:
+            self.broadcast.start()
+
+    def publish(self, keys):
+        if self.broadcast is not None:
+            self.broadcast.publish(keys)
+
+    def local_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.local.default_timeout
+        return min(timeout, self.local.default_timeout)
+
+    def remaining(self, key, version=None):
+        """
+        Seconds ``key`` has left in the shared cache, ``None`` if it does not
+        expire and ``0`` if the shared backend cannot tell, which is the case
+        for the backends shipped with Django.
+        """
+        pttl = getattr(self.shared, "pttl", None)
+        if pttl is not None:
+            remaining = pttl(key, version=version)
+            return remaining if remaining is None else remaining / 1000
+        ttl = getattr(self.shared, "ttl", None)
+        if ttl is not None:
+            return ttl(key, version=version)
+        return 0
+
+    def refill(self, key, value, version=None):
+        """
+        Keep ``value`` read from the shared cache locally, at most as long as
+        it is kept in the shared cache. Short lived entries like locks or
+        counters must not outlive their shared entry.
+        """
+        remaining = self.remaining(key, version)
+        if remaining is None:
+            timeout = self.local.default_timeout
+        else:
+            timeout = min(remaining, self.local.default_timeout)
+        if timeout > 0:
+            self.local.set(key, value, timeout, version)
+
+    def get(self, key, default=None, version=None):
+        self.subscribe()
+        value = self.local.get(key, MISSING, version)
+        if value is not MISSING:
+            return value
+        value = self.shared.get(key, MISSING, version)
+        if value is MISSING:
+            return default
+        self.refill(key, value, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        self.subscribe()
+        values = self.local.get_many(keys, version)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            shared = self.shared.get_many(missing, version)
+            for key, value in shared.items():
+                self.refill(key, value, version)
+            values.update(shared)
+        return values
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self.local.set(key, value, self.local_timeout(timeout), version)
+        self.publish([(key, version)])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        self.local.set_many(
+            {k: v for k, v in data.items() if k not in failed},
+            self.local_timeout(timeout),
+            version,
+        )
+        self.publish([(key, version) for key in data])
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.shared.add(key, value, timeout, version):
+            return False
+        self.local.set(key, value, self.local_timeout(timeout), version)
+        self.publish([(key, version)])
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.delete(key, version)
+        self.publish([(key, version)])
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.local.delete(key, version)
+        self.publish([(key, version)])
+        return self.shared.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        self.local.delete_many(keys, version)
+        self.publish([(key, version) for key in keys])
+        self.shared.delete_many(keys, version)
+
+    def has_key(self, key, version=None):
+        self.subscribe()
+        return self.local.has_key(key, version) or self.shared.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version)
+        self.local.delete(key, version)
+        self.publish([(key, version)])
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version)
+
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
+        self.publish(None)
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
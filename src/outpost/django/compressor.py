@@ -1,8 +1,25 @@
+import atexit
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import (
+    Counter,
+    OrderedDict,
+)
+from functools import lru_cache
 from pathlib import Path
 
+from compressor.cache import cache as compressor_cache
+from compressor.cache import get_precompiler_cachekey
+from compressor.exceptions import FilterError
 from compressor.filters import CompilerFilter
+from django.conf import settings
 from django.contrib.staticfiles import finders
 from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils.encoding import smart_str
 from django_libsass import (
     OUTPUT_STYLE,
     SOURCE_COMMENTS,
@@ -10,20 +27,475 @@ from django_libsass import (
     compile,
 )
 
+LESS_WORKER = """
+const less = require("less");
+const lines = require("readline").createInterface({input: process.stdin});
+const reply = (data) => process.stdout.write(JSON.stringify(data) + "\\n");
+lines.on("line", (line) => {
+  const request = JSON.parse(line);
+  less.render(request.content, {paths: request.paths, filename: request.filename})
+    .then((output) => reply({css: output.css}))
+    .catch((e) => reply({
+      error: e.filename ? `${e.message} in ${e.filename} on line ${e.line}` : e.message,
+    }));
+});
+"""
+
+
+def precompiler_cachekey(precompiler, content):
+    return get_precompiler_cachekey(
+        f"{precompiler.__module__}.{precompiler.__qualname__}", content
+    )
+
+
+class CacheablePrecompiler:
+    """
+    Honour ``COMPRESS_CACHEABLE_PRECOMPILERS`` for precompiler filter classes
+    the same way compressor's ``CachedCompilerFilter`` does for commands.
+
+    Subclasses set ``mimetype`` and implement ``precompile()``.
+    """
+
+    mimetype = None
+
+    def input(self, **kwargs):
+        if (
+            self.content is None
+            or self.mimetype not in settings.COMPRESS_CACHEABLE_PRECOMPILERS
+        ):
+            return self.precompile(**kwargs)
+        key = precompiler_cachekey(type(self), self.content)
+        data = compressor_cache.get(key)
+        if data is not None:
+            return smart_str(data)
+        filtered = self.precompile(**kwargs)
+        compressor_cache.set(key, filtered, settings.COMPRESS_REBUILD_TIMEOUT)
+        return filtered
+
+
+@lru_cache(maxsize=None)
+def include_paths():
+    return tuple(finders.find(".", all=True))
+
+
+class LessWorker:
+    """
+    Persistent Node.js process compiling LESS sources sent as JSON lines over
+    stdin and answering with the compiled CSS on stdout.
+    """
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            ["node", "-e", LESS_WORKER],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+            encoding="utf-8",
+        )
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def render(self, content, filename, paths, timeout=None):
+        request = {"content": content, "filename": filename, "paths": paths}
+        # Killing the process ends a blocked write or read with an error.
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, self.process.kill)
+            timer.daemon = True
+            timer.start()
+        try:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        finally:
+            if timer is not None:
+                timer.cancel()
+        if not line:
+            raise OSError("lessc worker exited or did not answer in time")
+        response = json.loads(line)
+        if "error" in response:
+            raise FilterError(response["error"])
+        return response["css"]
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+    def close(self):
+        if self.alive():
+            self.process.stdin.close()
+            self.process.wait()
+
+
+class LessWorkerPool:
+    """
+    Pool of up to ``size`` :class:`LessWorker` processes.
+
+    Threads wait up to ``timeout`` seconds for a worker and as long for its
+    answer, workers that crash or do not answer in time are killed and
+    replaced.
+    """
+
+    def __init__(self, size, timeout=60):
+        self.size = size
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self.condition = threading.Condition()
+        self.idle = list()
+        self.workers = list()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self.condition:
+            while True:
+                if self.idle:
+                    return self.idle.pop()
+                if len(self.workers) < self.size:
+                    worker = LessWorker()
+                    self.workers.append(worker)
+                    return worker
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise FilterError(
+                        f"Timed out waiting {self.timeout}s for a lessc worker"
+                    )
+                self.condition.wait(remaining)
+
+    def release(self, worker):
+        with self.condition:
+            self.idle.append(worker)
+            self.condition.notify()
+
+    def discard(self, worker):
+        with self.condition:
+            if worker in self.workers:
+                self.workers.remove(worker)
+            # A waiting thread may start a replacement now.
+            self.condition.notify()
+        worker.kill()
+
+    def render(self, content, filename, paths):
+        worker = self.acquire()
+        try:
+            css = worker.render(content, filename, paths, self.timeout)
+        except FilterError:
+            self.release(worker)
+            raise
+        except (OSError, ValueError) as e:
+            self.discard(worker)
+            raise FilterError(f"Unable to apply DjangoLessFilter: {e}")
+        self.release(worker)
+        return css
+
+    def close(self):
+        with self.condition:
+            workers, self.workers = self.workers, list()
+            self.idle = list()
+        for worker in workers:
+            worker.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def less_pool():
+    global _pool
+    size = getattr(settings, "COMPRESS_LESS_WORKERS", 0)
+    if not size:
+        return None
+    with _pool_lock:
+        # Worker processes must not be shared with forked children.
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = LessWorkerPool(size, getattr(settings, "COMPRESS_LESS_TIMEOUT", 60))
+            atexit.register(_pool.close)
+        return _pool
+
+
+class DjangoLessFilter(CacheablePrecompiler, CompilerFilter):
+    mimetype = "text/less"
 
-class DjangoLessFilter(CompilerFilter):
     def __init__(self, content, **kwargs):
-        DIRS = finders.find(".", all=True)
+        DIRS = include_paths()
         c = "lessc --include-path={path} {{infile}} {{outfile}}".format(
             path=":".join(DIRS)
         )
         super(DjangoLessFilter, self).__init__(content, command=c, **kwargs)
 
+    def precompile(self, **kwargs):
+        pool = less_pool()
+        if pool is None:
+            return CompilerFilter.input(self, **kwargs)
+        if self.filename is None:
+            content = self.content
+        else:
+            with open(self.filename, encoding=self.charset or "utf-8") as f:
+                content = f.read()
+        return pool.render(content, self.filename, list(include_paths()))
+
+
+class ImportCache:
+    """
+    Process wide cache for SCSS imports.
+
+    Resolved import names are memoized by the ``(path, prev)`` pair handed to
+    the importer as long as the modification time of the directory searched
+    does not change, so added and removed partials are picked up. Storages
+    without modification times keep them for
+    ``COMPRESS_SASS_IMPORT_CACHE_TIMEOUT`` seconds. File contents are kept in
+    a bounded LRU keyed by resolved name and modification time.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.clear()
+
+    @property
+    def size(self):
+        return getattr(settings, "COMPRESS_SASS_IMPORT_CACHE_SIZE", 256)
+
+    @property
+    def timeout(self):
+        return getattr(settings, "COMPRESS_SASS_IMPORT_CACHE_TIMEOUT", 60)
 
-class DjangoSassCompiler(SassCompiler):
     @staticmethod
-    def importer(path, prev=None):
+    def stamp(directory):
+        try:
+            return staticfiles_storage.get_modified_time(directory)
+        except (OSError, NotImplementedError):
+            return None
+
+    def clear(self):
+        with self.lock:
+            self.resolved = dict()
+            self.contents = OrderedDict()
+            self.counters.clear()
+
+    def stats(self):
+        with self.lock:
+            return dict(
+                self.counters,
+                resolved=len(self.resolved),
+                contents=len(self.contents),
+            )
 
+    def resolve(self, path, prev, resolver, directory):
+        """
+        Return ``resolver(path, prev)``, which looks up ``path`` in the
+        storage ``directory``, from the cache if it is still valid.
+        """
+        key = (path, prev)
+        stamp = self.stamp(directory)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.resolved.get(key)
+            if (
+                entry is not None
+                and entry[0] == stamp
+                and (stamp is not None or entry[1] > now)
+            ):
+                self.counters["resolve_hits"] += 1
+                return entry[2]
+            self.counters["resolve_misses"] += 1
+        search = resolver(path, prev)
+        with self.lock:
+            self.resolved[key] = (stamp, now + self.timeout, search)
+        return search
+
+    def forget(self, search):
+        with self.lock:
+            for key, entry in list(self.resolved.items()):
+                if entry[2] == search:
+                    del self.resolved[key]
+
+    def read(self, search):
+        try:
+            key = (search, staticfiles_storage.get_modified_time(search))
+        except (OSError, NotImplementedError):
+            key = None
+        with self.lock:
+            if key in self.contents:
+                self.counters["content_hits"] += 1
+                self.contents.move_to_end(key)
+                return self.contents[key]
+            self.counters["content_misses"] += 1
+        try:
+            with staticfiles_storage.open(search) as f:
+                content = f.read()
+        except OSError:
+            # Resolve it again on the next import, it was removed.
+            self.forget(search)
+            raise
+        if key is None:
+            return content
+        with self.lock:
+            self.contents[key] = content
+            while len(self.contents) > self.size:
+                self.contents.popitem(last=False)
+        return content
+
+
+cache = ImportCache()
+
+
+class DependencyTracker(threading.local):
+    """
+    Records the files resolved while compiling an SCSS entry on the current
+    thread together with a fingerprint of their content. Candidates probed
+    before them are recorded as missing, so adding one that would now win
+    the resolution changes the fingerprints too.
+    """
+
+    deps = None
+
+    @staticmethod
+    def fingerprint(kind, name):
+        if kind == "storage":
+            try:
+                content = cache.read(name)
+            except OSError:
+                return None
+            if isinstance(content, str):
+                content = content.encode()
+            return hashlib.sha1(content).hexdigest()
+        try:
+            stat = os.stat(name)
+        except OSError:
+            return None
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def start(self):
+        self.deps = dict()
+
+    def stop(self):
+        deps, self.deps = self.deps, None
+        return deps
+
+    def record(self, kind, name):
+        if self.deps is not None and (kind, name) not in self.deps:
+            self.deps[(kind, name)] = self.fingerprint(kind, name)
+
+    def probed(self, kind, candidates, found):
+        """
+        Track the ``candidates`` probed in order up to the one ``found``.
+        """
+        for candidate in candidates:
+            self.record(kind, candidate)
+            if candidate == found:
+                return
+
+    def native(self, path, prev):
+        """
+        Track the files libsass will probe on its own relative to ``prev``.
+        """
+        if self.deps is None or prev is None or not Path(prev).is_absolute():
+            return
+        base = Path(prev).parent / path
+        candidates = [
+            str(name.with_suffix(suffix))
+            for suffix in (".scss", ".sass", ".css")
+            for name in (base, base.with_name(f"_{base.name}"))
+        ]
+        found = next((c for c in candidates if os.path.isfile(c)), None)
+        self.probed("file", candidates, found)
+
+
+tracker = DependencyTracker()
+
+
+class CompileCache:
+    """
+    On-disk cache of compiled SCSS entries.
+
+    Each entry is stored together with the fingerprints of all its transitive
+    imports and is only reused as long as none of them changed. Storing an
+    entry removes the previous ones of the same source, entries not used for
+    ``max_age`` seconds are removed as well.
+    """
+
+    def __init__(self, directory, max_age=None):
+        self.directory = directory
+        if max_age is None:
+            max_age = getattr(settings, "COMPRESS_SASS_CACHE_MAX_AGE", 30 * 86400)
+        self.max_age = max_age
+
+    def filename(self, source, key):
+        return os.path.join(self.directory, f"{source}-{key}.json")
+
+    def get(self, source, key):
+        filename = self.filename(source, key)
+        try:
+            with open(filename) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        for kind, name, fingerprint in record.get("deps", []):
+            if tracker.fingerprint(kind, name) != fingerprint:
+                return None
+        try:
+            os.utime(filename)
+        except OSError:
+            pass
+        return record.get("css")
+
+    def set(self, source, key, deps, css):
+        os.makedirs(self.directory, exist_ok=True)
+        filename = self.filename(source, key)
+        tmp = f"{filename}.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp, "w") as f:
+            json.dump(
+                {"deps": [[k, n, f] for (k, n), f in deps.items()], "css": css}, f
+            )
+        os.replace(tmp, filename)
+        self.prune(source, key)
+
+    def prune(self, source, key):
+        """
+        Remove the entries of ``source`` other than ``key`` and all entries
+        not used for ``max_age`` seconds.
+        """
+        keep = os.path.basename(self.filename(source, key))
+        expired = time.time() - self.max_age
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name == keep or not entry.name.endswith(".json"):
+                    continue
+                try:
+                    if (
+                        entry.name.startswith(f"{source}-")
+                        or entry.stat().st_mtime < expired
+                    ):
+                        os.unlink(entry.path)
+                except OSError:
+                    pass
+
+
+class DjangoSassCompiler(CacheablePrecompiler, SassCompiler):
+    mimetype = "text/x-scss"
+
+    @staticmethod
+    def directory(path, prev=None):
+        """
+        Return the storage directory searched for ``path`` imported from
+        ``prev``.
+        """
+        name = Path(path).parent
+        if prev is not None:
+            p = Path(prev)
+            if not p.is_absolute():
+                name = p.parent / name
+        return str(name)
+
+    @staticmethod
+    def candidates(path, prev=None):
         n = Path(path)
         for name in (
             n.with_suffix(".scss"),
@@ -34,12 +506,72 @@ class DjangoSassCompiler(SassCompiler):
                 p = Path(prev)
                 if not p.is_absolute():
                     search = str(p.parent / name)
-            if not staticfiles_storage.exists(search):
-                continue
-            with staticfiles_storage.open(search) as content:
-                return [(search, content.read())]
+            yield search
 
-    def input(self, **kwargs):
+    @staticmethod
+    def resolve(path, prev=None):
+        for search in DjangoSassCompiler.candidates(path, prev):
+            if staticfiles_storage.exists(search):
+                return search
+        return None
+
+    @staticmethod
+    def importer(path, prev=None):
+        search = cache.resolve(
+            path,
+            prev,
+            DjangoSassCompiler.resolve,
+            DjangoSassCompiler.directory(path, prev),
+        )
+        if tracker.deps is not None:
+            tracker.probed("storage", DjangoSassCompiler.candidates(path, prev), search)
+        if search is None:
+            tracker.native(path, prev)
+            return None
+        return [(search, cache.read(search))]
+
+    @staticmethod
+    def stats():
+        return cache.stats()
+
+    def key(self):
+        h = hashlib.sha256()
+        if self.filename:
+            h.update(self.filename.encode())
+            with open(self.filename, "rb") as f:
+                h.update(f.read())
+        else:
+            h.update(self.content.encode())
+        h.update(f"{OUTPUT_STYLE}:{SOURCE_COMMENTS}".encode())
+        return h.hexdigest()
+
+    def source(self):
+        """
+        Identify the entry point, so entries for previous contents of the same
+        file can be removed.
+        """
+        name = self.filename or self.content
+        return hashlib.sha256(name.encode()).hexdigest()[:16]
+
+    def precompile(self, **kwargs):
+        directory = getattr(settings, "COMPRESS_SASS_CACHE_DIR", None)
+        if not directory:
+            return self.build()
+        store = CompileCache(directory)
+        source = self.source()
+        key = self.key()
+        css = store.get(source, key)
+        if css is not None:
+            return css
+        tracker.start()
+        try:
+            css = self.build()
+        finally:
+            deps = tracker.stop()
+        store.set(source, key, deps, css)
+        return css
+
+    def build(self):
         if self.filename:
             return compile(
                 filename=self.filename,
@@ -0,0 +1,275 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from django.db.utils import OperationalError
+
+from ..metrics import (
+    db_pool_connections,
+    db_pool_wait,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Pool:
+    """
+    Thread safe pool of DB-API connections.
+
+    At most ``max_size`` connections are open at once, checkouts wait up to
+    ``timeout`` seconds for one to be returned. Idle connections beyond
+    ``min_size`` are closed after ``max_idle`` seconds. Connections idle for
+    more than ``check_interval`` seconds are checked with ``SELECT 1`` before
+    they are handed out again.
+
+    Connections inherited from a parent process are never used nor closed,
+    as closing them would also affect the parent.
+    """
+
+    def __init__(
+        self,
+        alias,
+        min_size=0,
+        max_size=10,
+        timeout=10,
+        max_idle=300,
+        check_interval=30,
+    ):
+        self.alias = alias
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+        self.condition = threading.Condition()
+        self.inherited = list()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.idle = deque()
+        self.checked_out = set()
+        self.size = 0
+        self.used = 0
+        self.publish()
+
+    def publish(self):
+        db_pool_connections.labels(self.alias, "used").set(self.used)
+        db_pool_connections.labels(self.alias, "idle").set(self.size - self.used)
+        db_pool_connections.labels(self.alias, "max").set(self.max_size)
+
+    def after_fork(self):
+        if self.pid == os.getpid():
+            return
+        self.inherited.extend(connection for connection, _ in self.idle)
+        self.condition = threading.Condition()
+        self.reset()
+
+    def healthy(self, connection, since):
+        if getattr(connection, "closed", False):
+            return False
+        if time.monotonic() - since < self.check_interval:
+            return True
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+        except Exception:
+            return False
+        return True
+
+    def get(self, connect):
+        """
+        Check out a connection, calling ``connect`` if a new one is needed.
+        """
+        self.after_fork()
+        start = time.monotonic()
+        while True:
+            with self.condition:
+                while not self.idle and self.size >= self.max_size:
+                    remaining = self.timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        raise OperationalError(
+                            f"Timed out waiting {self.timeout}s for a connection "
+                            f"from pool {self.alias}"
+                        )
+                    self.condition.wait(remaining)
+                if self.idle:
+                    connection, since = self.idle.pop()
+                    self.checked_out.add(connection)
+                else:
+                    connection, since = None, None
+                    self.size += 1
+                self.used += 1
+            if connection is None:
+                try:
+                    connection = connect()
+                except Exception:
+                    self.release(None)
+                    raise
+            elif not self.healthy(connection, since):
+                logger.info(f"Discarding broken connection from pool {self.alias}")
+                self.release(connection)
+                continue
+            db_pool_wait.labels(self.alias).observe(time.monotonic() - start)
+            with self.condition:
+                self.checked_out.add(connection)
+                self.publish()
+            return connection
+
+    def put(self, connection):
+        """
+        Return a checked out connection to the pool.
+        """
+        if self.pid != os.getpid():
+            self.inherited.append(connection)
+            return
+        now = time.monotonic()
+        expired = list()
+        with self.condition:
+            if connection not in self.checked_out:
+                # Already released.
+                return
+            self.checked_out.discard(connection)
+            self.used -= 1
+            self.idle.append((connection, now))
+            while (
+                self.size - len(expired) > self.min_size
+                and now - self.idle[0][1] > self.max_idle
+            ):
+                expired.append(self.idle.popleft()[0])
+            self.size -= len(expired)
+            self.publish()
+            self.condition.notify(len(expired) + 1)
+        for connection in expired:
+            self.close(connection)
+
+    def release(self, connection):
+        """
+        Close a checked out connection instead of returning it to the pool.
+        Releasing a connection more than once has no effect.
+        """
+        if self.pid != os.getpid():
+            return
+        with self.condition:
+            if connection is not None:
+                if connection not in self.checked_out:
+                    return
+                self.checked_out.discard(connection)
+            self.used -= 1
+            self.size -= 1
+            self.publish()
+            self.condition.notify()
+        if connection is not None:
+            self.close(connection)
+
+    def clear(self):
+        """
+        Close all idle connections.
+        """
+        with self.condition:
+            if self.pid != os.getpid():
+                return
+            idle, self.idle = self.idle, deque()
+            self.size -= len(idle)
+            self.publish()
+            self.condition.notify_all()
+        for connection, _ in idle:
+            self.close(connection)
+
+    def close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+pools = dict()
+pools_lock = threading.Lock()
+
+
+def close_all():
+    """
+    Close the idle connections of all pools, e.g. before forking.
+    """
+    for pool in list(pools.values()):
+        pool.clear()
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Mixin for database wrappers checking out their connections from a
+    :class:`Pool` configured by ``POOL`` in the database settings and
+    returning them on close.
+
+    With ``CONN_MAX_AGE`` set to ``0`` connections return to the pool at the
+    end of each request, whichever thread handled it.
+    """
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get("POOL")
+        if options is None:
+            return None
+        pool = pools.get(self.alias)
+        if pool is None:
+            with pools_lock:
+                pool = pools.get(self.alias)
+                if pool is None:
+                    pool = pools[self.alias] = Pool(self.alias, **options)
+        return pool
+
+    def ensure_connection(self):
+        connection = self.connection
+        pool = self.pool
+        if (
+            pool is not None
+            and connection is not None
+            and getattr(connection, "closed", False)
+        ):
+            # django_dbconn_retry drops closed connections without closing
+            # them through the wrapper, give their slot back right away.
+            pool.release(connection)
+        super().ensure_connection()
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        return pool.get(partial(super().get_new_connection, conn_params))
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        connection = self.connection
+        if self.in_atomic_block:
+            # The connection stays referenced by this wrapper.
+            pool.release(connection)
+            return
+        try:
+            connection.rollback()
+        except Exception:
+            pool.release(connection)
+            return
+        pool.put(connection)
+
+
+try:
+    from django_dbconn_retry import pre_reconnect
+except ImportError:
+    pass
+else:
+
+    def discard_pooled_connections(sender, dbwrapper, **kwargs):
+        # Idle connections are most likely broken as well.
+        pool = pools.get(dbwrapper.alias)
+        if pool is not None:
+            pool.clear()
+
+    pre_reconnect.connect(discard_pooled_connections)
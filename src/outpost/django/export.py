@@ -0,0 +1,206 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+from rest_framework import (
+    renderers,
+    serializers,
+)
+from rest_framework.decorators import action
+from rest_framework.utils import encoders
+
+
+def iterate(queryset, chunk_size=None):
+    """
+    Iterate over ``queryset`` reading ``chunk_size`` rows at once without
+    caching them, prefetching related objects for every chunk.
+    """
+    if chunk_size is None:
+        chunk_size = getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+    lookups = queryset._prefetch_related_lookups
+    iterator = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        if lookups:
+            prefetch_related_objects(chunk, *lookups)
+        yield from chunk
+
+
+def buffered(parts, size=None):
+    """
+    Join the byte strings from ``parts`` into blocks of at least ``size``
+    bytes.
+    """
+    if size is None:
+        size = getattr(settings, "EXPORT_BUFFER_SIZE", 64 * 1024)
+    block = list()
+    length = 0
+    for part in parts:
+        block.append(part)
+        length += len(part)
+        if length >= size:
+            yield b"".join(block)
+            block.clear()
+            length = 0
+    if block:
+        yield b"".join(block)
+
+
+class StreamingRenderer(renderers.BaseRenderer):
+    """
+    Renderer encoding rows one by one with :meth:`stream`.
+
+    Data which is not streamed, like error responses, is rendered as a single
+    row.
+    """
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, dict):
+            data = [data]
+        return b"".join(self.stream(data, renderer_context))
+
+    def stream(self, rows, renderer_context=None):
+        raise NotImplementedError
+
+
+class NDJSONRenderer(StreamingRenderer):
+    """
+    Newline delimited JSON, one object per line.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def stream(self, rows, renderer_context=None):
+        encoder = encoders.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+        for row in rows:
+            yield encoder.encode(row).encode(self.charset) + b"\n"
+
+
+class CSVRenderer(StreamingRenderer):
+    """
+    CSV with a header taken from the ``serializer`` in the renderer context,
+    or from the first row without one. Nested serializers are flattened into
+    dotted column names, lists and other objects are encoded as JSON.
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+
+    def columns(self, serializer, prefix=""):
+        """
+        Return the column names for ``serializer`` and the prefixes of its
+        nested serializers.
+        """
+        names = list()
+        nested = set()
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            name = f"{prefix}{field.field_name}"
+            if isinstance(field, serializers.Serializer):
+                nested.add(name)
+                children, grandchildren = self.columns(field, f"{name}.")
+                names.extend(children)
+                nested.update(grandchildren)
+            else:
+                names.append(name)
+        return names, nested
+
+    def flatten(self, row, prefix="", nested=None):
+        for key, value in row.items():
+            name = f"{prefix}{key}"
+            if nested is not None and name in nested:
+                # Null nested objects leave their columns empty.
+                if isinstance(value, dict):
+                    yield from self.flatten(value, f"{name}.", nested)
+            elif nested is None and isinstance(value, dict):
+                yield from self.flatten(value, f"{name}.", nested)
+            elif isinstance(value, (list, tuple, dict)):
+                yield name, json.dumps(
+                    value, cls=encoders.JSONEncoder, ensure_ascii=False
+                )
+            else:
+                yield name, value
+
+    def stream(self, rows, renderer_context=None):
+        serializer = (renderer_context or {}).get("serializer")
+        buffer = io.StringIO()
+        writer = None
+        nested = None
+        if serializer is not None:
+            fieldnames, nested = self.columns(serializer)
+            writer = csv.DictWriter(buffer, fieldnames=fieldnames, restval="")
+            writer.writeheader()
+        for row in rows:
+            row = dict(self.flatten(row, nested=nested))
+            if writer is None:
+                writer = csv.DictWriter(
+                    buffer, fieldnames=list(row), restval="", extrasaction="ignore"
+                )
+                writer.writeheader()
+            writer.writerow(row)
+            yield buffer.getvalue().encode(self.charset)
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode(self.charset)
+
+
+class ExportMixin:
+    """
+    Viewset mixin adding an ``export`` list route streaming all filtered
+    objects as NDJSON or CSV, chosen by the ``Accept`` header or the
+    ``format`` query parameter.
+
+    Authentication, permissions and serializer setup run once per export
+    instead of once per page. Objects are read in chunks of
+    ``export_chunk_size`` rows and serialized one by one, so memory does not
+    grow with the number of objects.
+
+    The rows are produced while the response is sent, which needs a WSGI
+    worker thread. With ``ASGI_NATIVE_HTTP`` Django 3.2 iterates streaming
+    responses in the event loop, where database queries are not allowed.
+    """
+
+    export_chunk_size = None
+
+    def get_export_filename(self, renderer):
+        basename = getattr(self, "basename", None)
+        if basename is None:
+            return None
+        return f"{basename}.{renderer.format}"
+
+    @action(
+        detail=False,
+        methods=["get"],
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+        pagination_class=None,
+    )
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+        renderer = request.accepted_renderer
+        rows = (
+            serializer.to_representation(obj)
+            for obj in iterate(queryset, self.export_chunk_size)
+        )
+        context = dict(self.get_renderer_context(), serializer=serializer)
+        response = StreamingHttpResponse(
+            buffered(renderer.stream(rows, context)),
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
+        )
+        filename = self.get_export_filename(renderer)
+        if filename is not None:
+            response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
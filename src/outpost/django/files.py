@@ -0,0 +1,105 @@
+import hashlib
+import os
+import stat
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Upload handler streaming uploads to a temporary file like
+    ``TemporaryFileUploadHandler`` while hashing each chunk as it arrives.
+
+    The hex digest is available as ``digest`` on the uploaded file.
+    """
+
+    algorithm = "sha256"
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hash = hashlib.new(self.algorithm)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hash.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.digest = self.hash.hexdigest()
+        return file
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage keeping every distinct content only once.
+
+    Content is stored below ``.blobs/`` named by its digest and the requested
+    name becomes a hardlink to it, so names generated by ``upload_to`` are
+    kept and deleting one of them never affects other references. Temporary
+    uploads are moved into place with a rename if ``FILE_UPLOAD_TEMP_DIR`` is
+    on the same file system as ``MEDIA_ROOT``.
+
+    All names of a content share one inode, so stored files are immutable:
+    blobs are made read-only and changes must be saved as a new file instead
+    of being written in place.
+    """
+
+    algorithm = HashingFileUploadHandler.algorithm
+    prefix = ".blobs"
+
+    def digest(self, content):
+        digest = getattr(content, "digest", None)
+        if digest:
+            return digest
+        h = hashlib.new(self.algorithm)
+        for chunk in content.chunks():
+            h.update(chunk)
+        return h.hexdigest()
+
+    def blob(self, digest):
+        return os.path.join(self.prefix, digest[:2], digest[2:4], digest)
+
+    def seal(self, name):
+        """
+        Remove all write permissions from ``name``.
+        """
+        path = self.path(name)
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+        if mode & 0o222:
+            os.chmod(path, mode & ~0o222)
+
+    def _save(self, name, content):
+        blob = self.blob(self.digest(content))
+        if not self.exists(blob):
+            stored = super()._save(blob, content)
+            if stored != blob:
+                # Lost a race against an upload of the same content.
+                super().delete(stored)
+        # Blobs stored before they were sealed are sealed on their next use.
+        self.seal(blob)
+        directory = os.path.dirname(self.path(name))
+        os.makedirs(directory, exist_ok=True)
+        while True:
+            try:
+                os.link(self.path(blob), self.path(name))
+            except FileExistsError:
+                name = self.get_available_name(name)
+            else:
+                return name
+
+    def listdir(self, path):
+        directories, files = super().listdir(path)
+        if not path:
+            directories = [d for d in directories if d != self.prefix]
+        return directories, files
+
+    def orphans(self):
+        """
+        Yield the names of all blobs no longer referenced by any file.
+        """
+        for root, directories, files in os.walk(self.path(self.prefix)):
+            for name in files:
+                path = os.path.join(root, name)
+                if os.stat(path).st_nlink == 1:
+                    yield os.path.relpath(path, self.location)
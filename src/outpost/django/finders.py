@@ -1,3 +1,8 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from itertools import chain
 from pathlib import Path
 
@@ -9,12 +14,154 @@ from django.core.files.storage import FileSystemStorage
 from django.utils.safestring import SafeText
 
 
+def scan(root, mtimes=None, ignore_patterns=None):
+    """
+    Recursively walk ``root`` using :func:`os.scandir`, yielding the relative
+    path and :class:`os.DirEntry` for every entry below it.
+
+    Symbolic links are followed like :meth:`pathlib.Path.exists` would, so a
+    directory reachable through several links is walked once for each of
+    them. Only links pointing back to a directory of the current path are
+    not followed, as they would never end. If ``mtimes`` is given, the
+    modification time of every visited directory is recorded in it.
+    Entries matching ``ignore_patterns`` are skipped the same way
+    :func:`django.contrib.staticfiles.utils.get_files` does.
+    """
+    pending = [(root, "", frozenset())]
+    while pending:
+        directory, prefix, ancestors = pending.pop()
+        try:
+            stat = os.stat(directory)
+        except OSError:
+            continue
+        key = (stat.st_dev, stat.st_ino)
+        if key in ancestors:
+            continue
+        ancestors = ancestors | {key}
+        if mtimes is not None:
+            mtimes[directory] = stat.st_mtime_ns
+        try:
+            with os.scandir(directory) as entries:
+                entries = list(entries)
+        except OSError:
+            continue
+        for entry in entries:
+            name = os.path.join(prefix, entry.name)
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if ignore_patterns:
+                if utils.matches_patterns(entry.name, ignore_patterns):
+                    continue
+                if (
+                    not is_dir
+                    and prefix
+                    and utils.matches_patterns(name, ignore_patterns)
+                ):
+                    continue
+            if is_dir:
+                pending.append((entry.path, name, ancestors))
+            yield name, entry
+
+
+def collect(root, ignore_patterns):
+    """
+    Return the names of all files below ``root`` that
+    :func:`django.contrib.staticfiles.utils.get_files` would yield for a
+    storage located there, including every path reached through symbolic
+    links.
+    """
+    return [
+        name
+        for name, entry in scan(root, ignore_patterns=ignore_patterns)
+        if not entry.is_dir()
+    ]
+
+
+class SystemIndex:
+    """
+    In-memory mapping of virtual paths to their local files and directories
+    as configured in ``SYSTEM_STATIC_PATHS``.
+
+    The index is built on first use. If ``interval`` is not ``None``, the
+    modification times of all indexed directories are checked at most once
+    every ``interval`` seconds and the index is rebuilt if any of them has
+    changed.
+    """
+
+    def __init__(self, entries, interval=None):
+        self.entries = entries
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._index = None
+        self._mtimes = dict()
+        self._checked = 0
+
+    def build(self):
+        index = defaultdict(list)
+        mtimes = dict()
+        for virtual, paths in self.entries.items():
+            for local in paths:
+                root = str(local)
+                if not os.path.isdir(root):
+                    mtimes[root] = None
+                    if os.path.exists(root):
+                        index[virtual.parts].append(root)
+                    continue
+                index[virtual.parts].append(root)
+                for name, entry in scan(root, mtimes):
+                    # Skip dangling symbolic links like Path.exists() does.
+                    if entry.is_symlink() and not os.path.exists(entry.path):
+                        continue
+                    index[virtual.parts + Path(name).parts].append(entry.path)
+        return dict(index), mtimes
+
+    def stale(self):
+        for path, mtime in self._mtimes.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                if mtime is not None:
+                    return True
+        return False
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+    def lookup(self, parts):
+        now = time.monotonic()
+        index = self._index
+        if index is not None and (
+            self.interval is None or now - self._checked < self.interval
+        ):
+            return index.get(parts, [])
+        with self._lock:
+            if (
+                self._index is not None
+                and self.interval is not None
+                and now - self._checked >= self.interval
+            ):
+                self._checked = now
+                if self.stale():
+                    self._index = None
+            if self._index is None:
+                self._index, self._mtimes = self.build()
+                self._checked = now
+            return self._index.get(parts, [])
+
+
 class ScopedFileSystemStorage(FileSystemStorage):
     def __init__(self, location, directory, *args, **kwargs):
         super().__init__(location, *args, **kwargs)
         self._directory = Path(directory)
+        self._prefix = str(self._directory) + os.sep
 
     def path(self, path):
+        if path.startswith(self._prefix):
+            return os.path.join(self.location, path[len(self._prefix) :])
         p = Path(path)
         if (
             len(p.parts) >= len(self._directory.parts)
@@ -27,11 +174,12 @@ class ScopedFileSystemStorage(FileSystemStorage):
 
     def listdir(self, path):
         directories, files = [], []
-        for e in Path(self.path(path)).glob("*"):
-            if e.is_dir():
-                directories.append(e.name)
-            else:
-                files.append(e.name)
+        with os.scandir(self.path(path)) as entries:
+            for e in entries:
+                if e.is_dir():
+                    directories.append(e.name)
+                else:
+                    files.append(e.name)
         return directories, files
 
 
@@ -54,8 +202,18 @@ class SystemFinder(BaseFinder):
                 settings.SYSTEM_STATIC_PATHS.keys(),
             )
         )
+        if getattr(settings, "SYSTEM_STATIC_INDEX", False):
+            self.index = SystemIndex(
+                self.entries, getattr(settings, "SYSTEM_STATIC_INDEX_INTERVAL", None)
+            )
+        else:
+            self.index = None
         super().__init__(*args, **kwargs)
 
+    def rebuild(self):
+        if self.index is not None:
+            self.index.invalidate()
+
     def check(self, **kwargs):
         if not isinstance(settings.SYSTEM_STATIC_PATHS, dict):
             yield Error(
@@ -96,6 +254,11 @@ class SystemFinder(BaseFinder):
             path = Path(name.encode().decode())
         else:
             path = Path(name)
+        if self.index is not None:
+            matches = self.index.lookup(path.parts)
+            if not all:
+                return matches[0] if matches else []
+            return list(matches)
         matches = []
         for virtual, paths in self.entries.items():
             if path.parts[: len(virtual.parts)] != virtual.parts:
@@ -110,11 +273,18 @@ class SystemFinder(BaseFinder):
         return matches
 
     def list(self, ignore_patterns):
-        for virtual, paths in self.entries.items():
-            for path in paths:
-                storage = ScopedFileSystemStorage(
-                    location=str(path), directory=str(virtual)
-                )
-                files = utils.get_files(storage, ignore_patterns)
+        storages = [
+            (
+                str(virtual),
+                ScopedFileSystemStorage(location=str(path), directory=str(virtual)),
+            )
+            for virtual, paths in self.entries.items()
+            for path in paths
+        ]
+        with ThreadPoolExecutor() as executor:
+            results = executor.map(
+                lambda item: collect(item[1].location, ignore_patterns), storages
+            )
+            for (virtual, storage), files in zip(storages, results):
                 for name in files:
-                    yield str(virtual / name), storage
+                    yield os.path.join(virtual, name), storage
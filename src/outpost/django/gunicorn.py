@@ -1,7 +1,90 @@
+import gc
+import logging
 import multiprocessing
 import os
+import shutil
+import tempfile
 
 workers = int(
-    os.environ.get("OUTPOST_GUNICORN_WORKERS", multiprocessing.cpu_count() / 2)
+    os.environ.get("OUTPOST_GUNICORN_WORKERS", max(multiprocessing.cpu_count() // 2, 1))
 )
-worker_class = "uvicorn.workers.UvicornH11Worker"
+worker_class = {
+    "h11": "uvicorn.workers.UvicornH11Worker",
+    "httptools": "uvicorn.workers.UvicornWorker",
+}[os.environ.get("OUTPOST_GUNICORN_HTTP", "h11")]
+preload_app = os.environ.get("OUTPOST_GUNICORN_PRELOAD", "") not in ("", "0")
+max_requests = int(os.environ.get("OUTPOST_GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(
+    os.environ.get("OUTPOST_GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10)
+)
+
+if preload_app:
+    # The application is loaded right after this module, keep the collector
+    # from touching its objects until they are frozen in pre_fork.
+    gc.disable()
+
+# Metrics of all workers are aggregated through files in this directory. It
+# has to be set before prometheus_client is imported anywhere and has to exist
+# before the application is preloaded, which happens before any server hook.
+prometheus_multiproc_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), f"outpost-prometheus-{os.getpid()}"),
+)
+# Start from scratch, files left behind by a previous master are stale. This
+# module is executed again on reloads (HUP) and by masters started for an
+# upgrade (USR2), which inherit the environment and keep the files of the
+# running workers.
+if os.environ.get("OUTPOST_PROMETHEUS_MULTIPROC_DIR") != prometheus_multiproc_dir:
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    os.environ["OUTPOST_PROMETHEUS_MULTIPROC_DIR"] = prometheus_multiproc_dir
+os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+
+def pre_fork(server, worker):
+    if server.cfg.preload_app:
+        from django.db import connections
+
+        from outpost.django.db import pool
+
+        # Connections must not be shared between processes.
+        connections.close_all()
+        pool.close_all()
+        # Frozen objects are ignored by the collector, so it can run again in
+        # the master and in the worker without unsharing their pages.
+        gc.freeze()
+    gc.enable()
+
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        return
+    try:
+        from channels.layers import channel_layers
+    except ImportError:
+        pass
+    else:
+        # Channel layers hold connections bound to the event loop of the master.
+        channel_layers.backends.clear()
+    loggers = [logging.getLogger()] + [
+        logger
+        for logger in logging.Logger.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger)
+    ]
+    for logger in loggers:
+        for handler in logger.handlers:
+            if hasattr(handler, "after_fork"):
+                handler.after_fork()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    # Counters and histograms of the worker are kept to preserve the totals.
+    multiprocess.mark_process_dead(worker.pid, prometheus_multiproc_dir)
+
+
+def on_exit(server):
+    if server.reexec_pid:
+        # A new master started by USR2 takes over the directory.
+        return
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
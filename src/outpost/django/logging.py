@@ -1,4 +1,14 @@
+import atexit
+import copy
 import logging
+import os
+import queue
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from django.utils.module_loading import import_string
 
 
 class StaticFieldFilter(logging.Filter):
@@ -8,9 +18,259 @@ class StaticFieldFilter(logging.Filter):
     """
 
     def __init__(self, fields):
-        self.static_fields = fields
+        self.static_fields = dict(fields)
 
     def filter(self, record):
-        for k, v in self.static_fields.items():
-            setattr(record, k, v)
+        record.__dict__.update(self.static_fields)
         return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Python logging filter that rate limits records sharing the same logger,
+    level and message template with a token bucket each.
+
+    Every bucket allows bursts of up to ``burst`` records and refills at
+    ``rate`` records per second. Records exceeding it are dropped and
+    counted. Every ``interval`` seconds a background thread hands a summary
+    record with the number of suppressed messages in its ``suppressed``
+    attribute to all handlers using this filter. At most ``maxsize`` buckets
+    are kept, evicting the least recently used one after summarizing it.
+    """
+
+    summary = "Suppressed %d similar messages: %s"
+
+    def __init__(self, rate=1.0, burst=10, maxsize=1000, interval=60):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self.interval = interval
+        self.reset()
+        if hasattr(os, "register_at_fork"):
+            ref = weakref.ref(self)
+            os.register_at_fork(
+                after_in_child=lambda: ref() is not None and ref().reset()
+            )
+
+    def reset(self):
+        # Records suppressed in the parent are summarized there.
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+        self.worker = None
+
+    def filter(self, record):
+        if getattr(record, "suppressed", None) is not None:
+            return True
+        msg = record.msg if isinstance(record.msg, str) else str(record.msg)
+        key = (record.name, record.levelno, msg)
+        now = time.monotonic()
+        evicted = None
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [self.burst, now, 0]
+                if len(self.buckets) > self.maxsize:
+                    evicted = self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                if self.worker is None:
+                    self.start()
+                passed = False
+            else:
+                bucket[0] -= 1
+                passed = True
+        if evicted is not None and evicted[1][2]:
+            self.summarize(evicted[0], evicted[1][2])
+        return passed
+
+    def start(self):
+        self.worker = threading.Thread(
+            target=self.run, name=self.__class__.__name__, daemon=True
+        )
+        self.worker.start()
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        """
+        Summarize all records suppressed since the last summary.
+        """
+        pending = list()
+        with self.lock:
+            for key, bucket in self.buckets.items():
+                if bucket[2]:
+                    pending.append((key, bucket[2]))
+                    bucket[2] = 0
+        for key, suppressed in pending:
+            self.summarize(key, suppressed)
+
+    def handlers(self):
+        loggers = [logging.getLogger()] + [
+            logger
+            for logger in logging.Logger.manager.loggerDict.values()
+            if isinstance(logger, logging.Logger)
+        ]
+        handlers = list()
+        for logger in loggers:
+            for handler in logger.handlers:
+                if self in handler.filters and handler not in handlers:
+                    handlers.append(handler)
+        return handlers
+
+    def summarize(self, key, suppressed):
+        name, levelno, msg = key
+        record = logging.LogRecord(
+            name, levelno, __file__, 0, self.summary, (suppressed, msg), None
+        )
+        record.suppressed = suppressed
+        for handler in self.handlers():
+            if levelno >= handler.level:
+                handler.handle(record)
+
+
+class BackgroundHandler(logging.Handler):
+    """
+    Python logging handler that passes records through a bounded queue to a
+    background thread, which hands them to the wrapped ``handler`` in batches
+    of up to ``batch_size`` records.
+
+    ``handler`` is the dotted path of the wrapped handler class or a sequence
+    of them, the first importable one is used. It is constructed with all
+    remaining keyword arguments when the first record is emitted. If the
+    queue is full, records are dropped and counted in ``dropped``; the number
+    of dropped records is logged through the wrapped handler once the queue
+    drains again.
+    """
+
+    def __init__(self, handler, capacity=10000, batch_size=100, **kwargs):
+        super().__init__()
+        self.handler = (handler,) if isinstance(handler, str) else tuple(handler)
+        self.kwargs = kwargs
+        self.target = None
+        self.batch_size = batch_size
+        self.queue = queue.Queue(capacity)
+        self.dropped = 0
+        self.reported = 0
+        self.worker = None
+        self.pid = None
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        if self.target is not None:
+            self.target.setFormatter(fmt)
+
+    def build(self):
+        for path in self.handler[:-1]:
+            try:
+                cls = import_string(path)
+            except ImportError:
+                continue
+            break
+        else:
+            cls = import_string(self.handler[-1])
+        target = cls(**self.kwargs)
+        if self.formatter is not None:
+            target.setFormatter(self.formatter)
+        return target
+
+    def start(self):
+        with self.lock:
+            if self.worker is not None and self.pid == os.getpid():
+                return
+            if self.target is None:
+                self.target = self.build()
+            self.pid = os.getpid()
+            self.worker = threading.Thread(
+                target=self.run, name=f"{self.__class__.__name__}", daemon=True
+            )
+            self.worker.start()
+
+    def after_fork(self):
+        """
+        Discard the state inherited from the parent process, including records
+        still queued there and the wrapped handler with its connection.
+        """
+        self.queue = queue.Queue(self.queue.maxsize)
+        self.dropped = 0
+        self.reported = 0
+        self.worker = None
+        self.pid = None
+        self.target = None
+        self.createLock()
+
+    def prepare(self, record):
+        """
+        Return a copy of ``record`` with its message and traceback rendered,
+        as arguments may be mutated before the background thread gets to them
+        and other handlers still see the original record.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                formatter = self.formatter or logging.Formatter()
+                record.exc_text = formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            if self.worker is None or self.pid != os.getpid():
+                self.start()
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for record in batch:
+                if record is None:
+                    return
+                self.target.handle(record)
+            self.report()
+
+    def report(self):
+        dropped = self.dropped
+        if dropped == self.reported:
+            return
+        record = logging.LogRecord(
+            __name__,
+            logging.WARNING,
+            __file__,
+            0,
+            f"Dropped {dropped - self.reported} log records",
+            None,
+            None,
+        )
+        self.reported = dropped
+        self.target.handle(record)
+
+    def close(self):
+        worker = self.worker
+        if worker is not None and worker.is_alive() and self.pid == os.getpid():
+            try:
+                self.queue.put(None, timeout=1)
+            except queue.Full:
+                pass
+            worker.join(timeout=5)
+        self.worker = None
+        if self.target is not None:
+            self.target.close()
+        super().close()
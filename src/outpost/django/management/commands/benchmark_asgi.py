@@ -0,0 +1,124 @@
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand
+
+
+class Client:
+    """
+    Minimal in-process ASGI HTTP client issuing GET requests.
+    """
+
+    def __init__(self, app, host):
+        self.app = app
+        self.host = host
+
+    async def get(self, url):
+        url = urlsplit(url)
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": url.path,
+            "raw_path": url.path.encode(),
+            "query_string": url.query.encode(),
+            "root_path": "",
+            "headers": [(b"host", self.host.encode())],
+            "client": ("127.0.0.1", 50000),
+            "server": (self.host, 80),
+        }
+        requested = asyncio.Event()
+        done = asyncio.Event()
+        status = None
+
+        async def receive():
+            if not requested.is_set():
+                requested.set()
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif not message.get("more_body", False):
+                done.set()
+
+        await self.app(scope, receive, send)
+        done.set()
+        return status
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests per second and latency of the a2wsgi bridge and the "
+        "native Django ASGI handler by issuing GET requests in process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Paths to request.")
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--threads", type=int, default=None)
+        parser.add_argument("--host", default="localhost")
+        parser.add_argument("--json", action="store_true")
+
+    async def run(self, client, paths, requests, concurrency):
+        latencies = list()
+        statuses = dict()
+        counter = iter(range(requests))
+
+        async def worker():
+            for i in counter:
+                start = time.perf_counter()
+                status = await client.get(paths[i % len(paths)])
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        # Warm up caches and lazily initialized state once per path.
+        for path in paths:
+            await client.get(path)
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return {
+            "requests": requests,
+            "rps": requests / elapsed,
+            "p50": statistics.median(latencies) * 1000,
+            "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+            "statuses": statuses,
+        }
+
+    def handle(self, **options):
+        from ...asgi import http_application
+
+        results = dict()
+        for mode, native in (("a2wsgi", False), ("native", True)):
+            client = Client(
+                http_application(native=native, threads=options["threads"]),
+                options["host"],
+            )
+            results[mode] = asyncio.run(
+                self.run(
+                    client,
+                    options["paths"],
+                    options["requests"],
+                    options["concurrency"],
+                )
+            )
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:8} {result['rps']:10.1f} req/s  "
+                f"p50 {result['p50']:8.2f} ms  p99 {result['p99']:8.2f} ms  "
+                f"statuses {result['statuses']}"
+            )
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from ... import routing
+
+
+class Command(BaseCommand):
+    help = "Discover the channels routes of all installed apps and write them to ASGI_CHANNELS_MANIFEST."
+
+    def handle(self, **options):
+        if not getattr(settings, "ASGI_CHANNELS_MANIFEST", None):
+            raise CommandError("ASGI_CHANNELS_MANIFEST is not set.")
+        manifest = routing.discover()
+        routing.write(manifest)
+        for name, description in manifest["modules"].items():
+            if description is None:
+                self.stdout.write(f"{name}: imported eagerly")
+            else:
+                self.stdout.write(
+                    f"{name}: {len(description['urls'])} urls, "
+                    f"{len(description['worker'])} workers"
+                )
@@ -0,0 +1,148 @@
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+
+from django.conf import settings
+from django.contrib.staticfiles.management.commands import collectstatic
+from django.template.defaultfilters import filesizeformat
+
+from ...finders import ScopedFileSystemStorage
+
+# Linux FICLONE ioctl, see ioctl_ficlone(2).
+FICLONE = 0x40049409
+
+
+def digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def place(source, target):
+    """
+    Place ``source`` at ``target`` using a hardlink, falling back to a reflink
+    and finally to a regular copy if the filesystem supports neither.
+    """
+    try:
+        os.link(source, target)
+        return "hardlink"
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return "reflink"
+        except OSError:
+            shutil.copyfileobj(src, dst)
+    shutil.copystat(source, target)
+    return "copy"
+
+
+class Manifest(dict):
+    version = 1
+
+    def __init__(self, filename):
+        super().__init__()
+        self.filename = filename
+        try:
+            with open(filename) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == self.version:
+            self.update(data.get("files", {}))
+
+    def save(self):
+        tmp = f"{self.filename}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": self.version, "files": self}, f)
+        os.replace(tmp, self.filename)
+
+
+class Command(collectstatic.Command):
+    """
+    Collect static files, but keep a manifest of everything taken from
+    ``SYSTEM_STATIC_PATHS`` so unchanged files can be skipped on the next run
+    and changed files are linked instead of copied.
+    """
+
+    def handle(self, **options):
+        filename = getattr(settings, "SYSTEM_STATIC_MANIFEST", None)
+        self.manifest = Manifest(filename) if filename else None
+        if self.manifest is not None and options["clear"]:
+            self.manifest.clear()
+        self.skipped = [0, 0]
+        self.placed = [0, 0]
+        summary = super().handle(**options)
+        if self.manifest is not None and not self.dry_run:
+            self.manifest.save()
+        if summary:
+            summary = (
+                f"{summary}\n"
+                f"{self.skipped[0]} system static files ({filesizeformat(self.skipped[1])}) "
+                f"skipped, {self.placed[0]} ({filesizeformat(self.placed[1])}) linked.\n"
+            )
+        return summary
+
+    def unchanged(self, record, source, stat, target):
+        if record["source"] != source or record["size"] != stat.st_size:
+            return False
+        try:
+            current = os.stat(target)
+        except OSError:
+            return False
+        if current.st_size != stat.st_size:
+            return False
+        if current.st_mtime_ns != record["target"] and not os.path.samefile(
+            source, target
+        ):
+            return False
+        if record["mtime"] != stat.st_mtime_ns:
+            if digest(source) != record["hash"]:
+                return False
+            record["mtime"] = stat.st_mtime_ns
+            record["target"] = current.st_mtime_ns
+        return True
+
+    def copy_file(self, path, prefixed_path, source_storage):
+        if (
+            self.manifest is None
+            or not self.local
+            or not isinstance(source_storage, ScopedFileSystemStorage)
+            or prefixed_path in self.copied_files
+        ):
+            return super().copy_file(path, prefixed_path, source_storage)
+        source = source_storage.path(path)
+        target = self.storage.path(prefixed_path)
+        stat = os.stat(source)
+        record = self.manifest.get(prefixed_path)
+        if record and self.unchanged(record, source, stat, target):
+            self.log(f"Skipping '{path}' (unchanged)")
+            self.unmodified_files.append(prefixed_path)
+            self.skipped[0] += 1
+            self.skipped[1] += stat.st_size
+            return
+        if self.dry_run:
+            self.log(f"Pretending to link '{source}'", level=1)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if os.path.lexists(target):
+                os.unlink(target)
+            method = place(source, target)
+            self.log(f"Linking '{source}' ({method})", level=2)
+            self.manifest[prefixed_path] = {
+                "source": source,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "hash": digest(source),
+                "target": os.stat(target).st_mtime_ns,
+            }
+        self.placed[0] += 1
+        self.placed[1] += stat.st_size
+        self.copied_files.append(prefixed_path)
@@ -0,0 +1,181 @@
+import os
+import time
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    as_completed,
+)
+
+import django
+from compressor.base import SOURCE_FILE
+from compressor.management.commands import compress
+from compressor.offline.django import DjangoParser
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.template import Context
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+
+from ...compressor import (
+    compressor_cache,
+    precompiler_cachekey,
+)
+
+EXTENSIONS = {
+    "text/less": ".less",
+    "text/x-scss": ".scss",
+    "text/x-sass": ".sass",
+}
+
+
+def precompile(mimetype, filename, content):
+    precompiler = import_string(dict(settings.COMPRESS_PRECOMPILERS)[mimetype])
+    start = time.perf_counter()
+    try:
+        output = precompiler(
+            content,
+            attrs={"type": mimetype},
+            filter_type="css",
+            filename=filename,
+            charset="utf-8",
+        ).input()
+    except Exception as e:
+        return None, time.perf_counter() - start, str(e)
+    return output, time.perf_counter() - start, None
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile all inputs of COMPRESS_PRECOMPILERS found in templates and "
+        "static files in parallel and generate the offline manifest."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=len(os.sched_getaffinity(0)),
+            help="Number of worker processes, defaults to the available cores.",
+        )
+        parser.add_argument(
+            "--no-manifest",
+            action="store_true",
+            help="Only precompile, do not generate the offline manifest.",
+        )
+
+    def from_finders(self, mimetypes):
+        extensions = {v: k for k, v in EXTENSIONS.items() if k in mimetypes}
+        for finder in get_finders():
+            for path, storage in finder.list(["CVS", ".*", "*~"]):
+                base, extension = os.path.splitext(os.path.basename(path))
+                if extension not in extensions or base.startswith("_"):
+                    continue
+                filename = storage.path(path)
+                with open(filename, encoding="utf-8-sig") as f:
+                    yield extensions[extension], filename, f.read()
+
+    def from_templates(self, mimetypes):
+        parser = DjangoParser(charset="utf-8")
+        contexts = settings.COMPRESS_OFFLINE_CONTEXT
+        if isinstance(contexts, str):
+            contexts = import_string(contexts)()
+        elif not isinstance(contexts, (list, tuple)):
+            contexts = [contexts]
+        paths = set()
+        for loader in compress.Command().get_loaders():
+            try:
+                paths.update(str(origin) for origin in loader.get_template_sources(""))
+            except (AttributeError, TypeError):
+                pass
+        for path in paths:
+            for root, dirs, files in os.walk(path):
+                for name in files:
+                    if name.startswith(".") or not name.endswith(".html"):
+                        continue
+                    try:
+                        template = parser.parse(os.path.join(root, name))
+                    except Exception:
+                        continue
+                    for context in contexts:
+                        yield from self.from_template(
+                            parser, template, context, mimetypes
+                        )
+
+    def from_template(self, parser, template, context, mimetypes):
+        context = Context(parser.get_init_context(context))
+        try:
+            nodes = list(parser.walk_nodes(template, context=context))
+        except Exception:
+            return
+        for node in nodes:
+            if node.kind != "css":
+                continue
+            context.push()
+            parser.process_node(template, context, node)
+            content = parser.render_nodelist(template, context, node)
+            context.pop()
+            compressor = node.compressor_cls(node.kind)(
+                node.kind, content=content, context=context
+            )
+            for kind, value, basename, elem in compressor.split_contents():
+                mimetype = compressor.parser.elem_attribs(elem).get("type")
+                if mimetype not in mimetypes:
+                    continue
+                if kind == SOURCE_FILE:
+                    yield mimetype, value, compressor.get_filecontent(value, "utf-8")
+                else:
+                    yield mimetype, None, value
+
+    def handle(self, **options):
+        mimetypes = dict(settings.COMPRESS_PRECOMPILERS)
+        inputs = dict()
+        for mimetype, filename, content in self.from_templates(mimetypes):
+            inputs.setdefault((mimetype, filename, content), "template")
+        for mimetype, filename, content in self.from_finders(mimetypes):
+            inputs.setdefault((mimetype, filename, content), "static")
+        if not inputs:
+            raise CommandError("No precompiler inputs found.")
+        self.stdout.write(
+            f"Precompiling {len(inputs)} inputs using {options['workers']} workers"
+        )
+
+        timings = list()
+        failed = 0
+        start = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=options["workers"], initializer=django.setup
+        ) as executor:
+            futures = {executor.submit(precompile, *key): key for key in inputs.keys()}
+            for future in as_completed(futures):
+                mimetype, filename, content = futures[future]
+                output, duration, error = future.result()
+                name = filename or f"<inline {inputs[futures[future]]} block>"
+                timings.append((duration, name))
+                if error is not None:
+                    failed += 1
+                    self.stderr.write(f"Failed to precompile {name}: {error}")
+                    continue
+                compressor_cache.set(
+                    precompiler_cachekey(import_string(mimetypes[mimetype]), content),
+                    output,
+                    settings.COMPRESS_REBUILD_TIMEOUT,
+                )
+        elapsed = time.perf_counter() - start
+
+        for duration, name in sorted(timings, reverse=True):
+            self.stdout.write(f"{duration:10.3f}s  {name}")
+        self.stdout.write(
+            f"Precompiled {len(timings) - failed} of {len(timings)} inputs in "
+            f"{elapsed:.3f}s ({sum(d for d, _ in timings):.3f}s compile time)"
+        )
+        if not options["no_manifest"]:
+            # Results are only picked up from the cache for cacheable
+            # precompilers. Enabling them just here keeps content keyed
+            # results of files whose imports changed from being served
+            # outside of offline compression.
+            with override_settings(COMPRESS_CACHEABLE_PRECOMPILERS=tuple(mimetypes)):
+                call_command("compress", force=True, verbosity=options["verbosity"])
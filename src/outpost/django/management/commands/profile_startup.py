@@ -0,0 +1,195 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+# Runs in a fresh interpreter so nothing is imported before it is measured.
+PROBE = """
+import json
+import os
+import sys
+import time
+from importlib import import_module
+
+entries = list()
+
+
+def rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure(phase, name, func, *args):
+    entry = {"phase": phase, "name": name}
+    memory = rss()
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    except Exception as e:
+        entry["error"] = f"{e.__class__.__name__}: {e}"
+    finally:
+        entry["time"] = time.perf_counter() - start
+        entry["memory"] = rss() - memory
+        entries.append(entry)
+
+
+def optional(name):
+    try:
+        return import_module(name)
+    except ModuleNotFoundError as e:
+        if e.name != name:
+            raise
+        return None
+
+
+def probe(phase, name, module):
+    if measure(phase, name, optional, module) is None and "error" not in entries[-1]:
+        entries.pop()
+
+
+import django
+from django.apps import AppConfig
+
+create = AppConfig.create.__func__
+
+
+def timed(cls, entry):
+    app_config = measure("apps", entry, create, cls, entry)
+    import_models = app_config.import_models
+    ready = app_config.ready
+    app_config.import_models = lambda: measure("models", app_config.name, import_models)
+    app_config.ready = lambda: measure("ready", app_config.name, ready)
+    return app_config
+
+
+AppConfig.create = classmethod(timed)
+measure("settings", os.environ["DJANGO_SETTINGS_MODULE"], import_module, os.environ["DJANGO_SETTINGS_MODULE"])
+measure("setup", "django.setup()", django.setup)
+
+from django.apps import apps
+from django.conf import settings
+
+configs = sorted(apps.get_app_configs(), key=lambda app: app.label)
+for app in configs:
+    if app.name.startswith("outpost.django."):
+        probe("urls", app.name, f"{app.name}.urls")
+measure("urls", settings.ROOT_URLCONF, import_module, settings.ROOT_URLCONF)
+for app in configs:
+    probe("channels", app.name, f"{app.name}.channels")
+
+with open(sys.argv[1], "w") as f:
+    json.dump({"entries": entries, "rss": rss()}, f)
+"""
+
+PHASES = ("settings", "setup", "apps", "models", "ready", "urls", "channels")
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure wall time and memory of importing the settings, django.setup() "
+        "broken down by app, the urls and the channels discovery in a fresh "
+        "interpreter."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=3,
+            help="Number of fresh interpreters to measure, medians are reported.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=25,
+            help="Number of slowest entries to report.",
+        )
+        parser.add_argument("--json", action="store_true")
+        parser.add_argument(
+            "--max-time",
+            type=float,
+            default=None,
+            help="Fail if the total startup time exceeds this many seconds.",
+        )
+
+    def run(self):
+        env = dict(os.environ)
+        env["DJANGO_SETTINGS_MODULE"] = settings.SETTINGS_MODULE
+        env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+        with tempfile.NamedTemporaryFile(suffix=".json") as output:
+            process = subprocess.run(
+                [sys.executable, "-c", PROBE, output.name],
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+            )
+            if process.returncode != 0:
+                raise CommandError(f"Startup probe failed:\n{process.stderr}")
+            return json.load(output)
+
+    def aggregate(self, runs):
+        entries = dict()
+        for run in runs:
+            for entry in run["entries"]:
+                key = (entry["phase"], entry["name"])
+                aggregated = entries.setdefault(
+                    key, dict(entry, time=list(), memory=list())
+                )
+                aggregated["time"].append(entry["time"])
+                aggregated["memory"].append(entry["memory"])
+        for entry in entries.values():
+            entry["time"] = statistics.median(entry["time"])
+            entry["memory"] = statistics.median(entry["memory"])
+        entries = sorted(entries.values(), key=lambda e: e["time"], reverse=True)
+        phases = {
+            phase: sum(e["time"] for e in entries if e["phase"] == phase)
+            for phase in PHASES
+        }
+        return {
+            "total": phases["settings"]
+            + phases["setup"]
+            + phases["urls"]
+            + phases["channels"],
+            "rss": statistics.median(r["rss"] for r in runs),
+            "phases": phases,
+            "entries": entries,
+        }
+
+    def handle(self, **options):
+        report = self.aggregate([self.run() for _ in range(options["runs"])])
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(
+                f"Total {report['total']:.3f}s, RSS {report['rss'] / 2 ** 20:.1f} MiB"
+            )
+            for phase, seconds in report["phases"].items():
+                self.stdout.write(f"  {phase:10} {seconds:8.3f}s")
+            self.stdout.write("")
+            for entry in report["entries"][: options["limit"]]:
+                line = (
+                    f"{entry['time']:8.3f}s {entry['memory'] / 2 ** 20:8.1f} MiB  "
+                    f"{entry['phase']:10} {entry['name']}"
+                )
+                if "error" in entry:
+                    line = f"{line}  ({entry['error']})"
+                self.stdout.write(line)
+        if options["max_time"] is not None and report["total"] > options["max_time"]:
+            raise CommandError(
+                f"Startup took {report['total']:.3f}s, "
+                f"exceeding {options['max_time']:.3f}s"
+            )
@@ -0,0 +1,168 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import (
+    models,
+    transaction,
+)
+
+from ...utils import Uuid4Upload
+
+
+def target(name, depth):
+    """
+    Return the name ``name`` should have with ``depth`` levels of shards or
+    ``None`` if it was not generated by :class:`Uuid4Upload`.
+    """
+    path = PurePosixPath(name)
+    parts = path.parts
+    if len(parts) < 3:
+        return None
+    shards = list(parts[2:-1])
+    if shards != Uuid4Upload.shards(path.stem, len(shards)):
+        return None
+    return str(
+        PurePosixPath(*parts[:2], *Uuid4Upload.shards(path.stem, depth), path.name)
+    )
+
+
+def move(storage, old, new):
+    if storage.exists(new):
+        return not storage.exists(old)
+    if not storage.exists(old):
+        return False
+    try:
+        source, destination = storage.path(old), storage.path(new)
+    except NotImplementedError:
+        with storage.open(old) as content:
+            storage.save(new, content)
+        storage.delete(old)
+        return True
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    os.rename(source, destination)
+    return True
+
+
+def prune(storage, name):
+    """
+    Remove the shard directories of ``name`` which are empty after it was
+    moved away.
+    """
+    parent = PurePosixPath(name).parent
+    while len(parent.parts) > 2:
+        try:
+            os.rmdir(storage.path(str(parent)))
+        except (OSError, NotImplementedError):
+            return
+        parent = parent.parent
+
+
+class Command(BaseCommand):
+    help = (
+        "Move files uploaded through Uuid4Upload to the directory layout "
+        "configured by UPLOAD_SHARD_DEPTH and update all references."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--depth",
+            type=int,
+            default=getattr(settings, "UPLOAD_SHARD_DEPTH", 0),
+            help="Number of shard levels, defaults to UPLOAD_SHARD_DEPTH.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument(
+            "--state",
+            default=os.path.join(settings.BASE_DIR, "reshard.json"),
+            help="File recording progress to resume an interrupted run.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore progress recorded by a previous run.",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def fields(self):
+        for model in apps.get_models():
+            if model._meta.proxy:
+                continue
+            for field in model._meta.local_fields:
+                if not isinstance(field, models.FileField):
+                    continue
+                if isinstance(field.upload_to, type) and issubclass(
+                    field.upload_to, Uuid4Upload
+                ):
+                    yield model, field
+
+    def handle(self, **options):
+        self.options = options
+        self.state = dict()
+        if not options["restart"]:
+            try:
+                with open(options["state"]) as f:
+                    self.state = json.load(f)
+            except (OSError, ValueError):
+                pass
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            for model, field in self.fields():
+                self.reshard(executor, model, field)
+        if not options["dry_run"] and os.path.exists(options["state"]):
+            os.remove(options["state"])
+
+    def checkpoint(self, key, last):
+        if self.options["dry_run"]:
+            return
+        self.state[key] = str(last)
+        tmp = f"{self.options['state']}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.options["state"])
+
+    def reshard(self, executor, model, field):
+        key = f"{model._meta.label}.{field.name}"
+        last = self.state.get(key)
+        queryset = (
+            model._base_manager.exclude(**{field.attname: ""})
+            .exclude(**{f"{field.attname}__isnull": True})
+            .order_by("pk")
+        )
+        moved = missing = 0
+        while True:
+            batch = queryset if last is None else queryset.filter(pk__gt=last)
+            rows = list(
+                batch.values_list("pk", field.attname)[: self.options["batch_size"]]
+            )
+            if not rows:
+                break
+            pending = list()
+            for pk, old in rows:
+                new = target(old, self.options["depth"])
+                if new is not None and new != old:
+                    pending.append((pk, old, new))
+            if self.options["dry_run"]:
+                for pk, old, new in pending:
+                    self.stdout.write(f"{key} {pk}: {old} -> {new}")
+            elif pending:
+                results = executor.map(
+                    lambda item: move(field.storage, item[1], item[2]), pending
+                )
+                done = [item for item, ok in zip(pending, results) if ok]
+                updates = [
+                    model(pk=pk, **{field.attname: new}) for pk, old, new in done
+                ]
+                with transaction.atomic():
+                    model._base_manager.bulk_update(updates, [field.name])
+                for pk, old, new in done:
+                    prune(field.storage, old)
+                moved += len(updates)
+                missing += len(pending) - len(updates)
+            last = rows[-1][0]
+            self.checkpoint(key, last)
+        self.stdout.write(f"{key}: moved {moved} files, {missing} missing")
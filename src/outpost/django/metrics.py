@@ -0,0 +1,50 @@
+import os
+from functools import lru_cache
+
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+db_pool_wait = Histogram(
+    "django_db_pool_wait_seconds",
+    "Time spent waiting to check out a pooled database connection.",
+    ["alias"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf")),
+)
+db_pool_connections = Gauge(
+    "django_db_pool_connections",
+    "Open pooled database connections by state, divide used by max for the "
+    "utilization of the pool.",
+    ["alias", "state"],
+    multiprocess_mode="livesum",
+)
+
+
+def directory():
+    return os.environ.get(
+        "PROMETHEUS_MULTIPROC_DIR", os.environ.get("prometheus_multiproc_dir")
+    )
+
+
+@lru_cache(maxsize=None)
+def registry():
+    """
+    Return the registry to export, aggregating the metrics written by all
+    processes sharing ``PROMETHEUS_MULTIPROC_DIR`` if it is set.
+    """
+    if not directory():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def export(request):
+    return HttpResponse(generate_latest(registry()), content_type=CONTENT_TYPE_LATEST)
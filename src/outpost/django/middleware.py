@@ -0,0 +1,17 @@
+from djangosaml2.middleware import (
+    SamlSessionMiddleware as BaseSamlSessionMiddleware,
+)
+
+
+class SamlSessionMiddleware(BaseSamlSessionMiddleware):
+    """
+    SAML session middleware linking the SAML session to the Django session,
+    so both are loaded from the cache in one round trip if the session engine
+    supports it.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        session = getattr(request, "session", None)
+        if hasattr(session, "link") and hasattr(request.saml_session, "link"):
+            session.link(request.saml_session)
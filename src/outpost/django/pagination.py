@@ -0,0 +1,318 @@
+import json
+import logging
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import (
+    EmptyResultSet,
+    FieldDoesNotExist,
+)
+from django.db import connections
+from django.utils.translation import gettext_lazy as _
+from rest_framework import pagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+logger = logging.getLogger(__name__)
+
+
+def estimate(queryset):
+    """
+    Return the number of rows the PostgreSQL planner expects ``queryset`` to
+    return or ``None`` if no estimate is available.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    try:
+        sql, params = queryset.order_by().query.get_compiler(queryset.db).as_sql()
+    except EmptyResultSet:
+        return 0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+    except Exception:
+        logger.warning("Unable to estimate row count", exc_info=True)
+        return None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def indexed(model, name):
+    """
+    Return the attribute name of the field ``name`` if it is the leading
+    column of an index and usable as a cursor, ``None`` otherwise.
+
+    Nullable fields are not usable as ``NULL`` never compares greater than a
+    cursor position. Neither are relations to models with a default ordering,
+    as ordering by them orders by the related model.
+    """
+    if name == "pk":
+        return "pk"
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    if not getattr(field, "concrete", False) or field.many_to_many:
+        return None
+    if field.null:
+        return None
+    if field.is_relation and field.related_model._meta.ordering:
+        return None
+    if field.primary_key or field.unique or field.db_index:
+        return field.attname
+    leading = [
+        index.fields[0].lstrip("-") for index in model._meta.indexes if index.fields
+    ]
+    leading.extend(fields[0] for fields in model._meta.unique_together)
+    leading.extend(fields[0] for fields in model._meta.index_together)
+    if name in leading or field.attname in leading:
+        return field.attname
+    return None
+
+
+def unique(model, name):
+    """
+    Return whether the field ``name`` alone is unique.
+    """
+    if name == "pk":
+        return True
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    if field.primary_key or field.unique:
+        return True
+    return any(
+        tuple(fields) in ((field.name,), (field.attname,))
+        for fields in model._meta.unique_together
+    )
+
+
+class CountMixin:
+    """
+    Pagination mixin letting clients choose how the total number of results
+    is determined with the ``count`` query parameter:
+
+    ``exact``
+        Run ``COUNT(*)``.
+    ``estimate``
+        Use the planner statistics of PostgreSQL, falling back to an exact
+        count below ``PAGINATION_COUNT_THRESHOLD`` rows.
+    ``none``
+        Do not count at all, ``count`` is ``null`` in the response.
+
+    The default is the ``pagination_count`` attribute of the view, falling
+    back to ``PAGINATION_COUNT``. Estimates may be far off after bulk loads
+    until the table is analyzed again, so views opt in to them.
+    """
+
+    count_query_param = "count"
+    count_query_description = _(
+        "How to count results: exact, estimate (planner statistics) or none."
+    )
+    count_modes = ("exact", "estimate", "none")
+
+    def get_count_mode(self, request, view=None):
+        mode = request.query_params.get(self.count_query_param)
+        if mode in self.count_modes:
+            return mode
+        mode = getattr(view, "pagination_count", None)
+        if mode in self.count_modes:
+            return mode
+        return getattr(settings, "PAGINATION_COUNT", "exact")
+
+    def count_queryset(self, queryset, request, view=None):
+        mode = self.get_count_mode(request, view)
+        if mode == "none":
+            return None
+        if mode == "estimate":
+            rows = estimate(queryset)
+            if rows is not None and rows >= getattr(
+                settings, "PAGINATION_COUNT_THRESHOLD", 10000
+            ):
+                return rows
+        try:
+            return queryset.count()
+        except (AttributeError, TypeError):
+            return len(queryset)
+
+    def get_count_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": str(self.count_query_description),
+                "schema": {"type": "string", "enum": list(self.count_modes)},
+            }
+        ]
+
+
+class LimitOffsetPagination(CountMixin, pagination.LimitOffsetPagination):
+    """
+    Limit/offset pagination determining whether there is a next page by
+    fetching one more row, so it works without an exact count.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+        self.count = self.count_queryset(queryset, request, view)
+        results = list(queryset[self.offset : self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        if (self.has_next or self.offset > 0) and self.template is not None:
+            self.display_page_controls = True
+        return results[: self.limit]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
+
+    def get_html_context(self):
+        if self.count is None:
+            return {
+                "previous_url": self.get_previous_link(),
+                "next_url": self.get_next_link(),
+                "page_links": [],
+            }
+        # Estimates may be off, never link pages before the next one.
+        count = self.count
+        self.count = max(count, self.offset + self.limit + int(self.has_next))
+        try:
+            return super().get_html_context()
+        finally:
+            self.count = count
+
+
+class KeysetPagination(CountMixin, pagination.CursorPagination):
+    """
+    Cursor pagination over a given ``ordering``, including ``count`` in the
+    response like :class:`LimitOffsetPagination`.
+    """
+
+    page_size_query_param = "limit"
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = ordering
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = self.count_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("count", self.count),
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+
+class Pagination(pagination.BasePagination):
+    """
+    Project wide pagination using keyset pagination whenever the results are
+    ordered by fields whose first one is indexed and not nullable, so deep
+    pages do not scan all previous rows. Unordered results are ordered by
+    primary key, which is also added to break ties of non-unique orderings.
+
+    ``limit`` sets the page size in either mode. Requests passing ``offset``
+    get limit/offset pagination as before, which is also used for any other
+    ordering.
+    """
+
+    def __init__(self):
+        self.keyset = KeysetPagination()
+        self.limit_offset = LimitOffsetPagination()
+        self.paginator = self.limit_offset
+
+    @property
+    def display_page_controls(self):
+        return self.paginator.display_page_controls
+
+    def get_keyset_ordering(self, queryset):
+        query = queryset.query
+        if query.order_by:
+            ordering = list(query.order_by)
+        elif query.default_ordering and queryset.model._meta.ordering:
+            ordering = list(queryset.model._meta.ordering)
+        else:
+            ordering = ["pk"]
+        if not ordering or not all(isinstance(o, str) for o in ordering):
+            return None
+        first = ordering[0]
+        if "__" in first or first == "?":
+            return None
+        name = first.lstrip("-")
+        attname = indexed(queryset.model, name)
+        if attname is None:
+            return None
+        prefix = "-" if first.startswith("-") else ""
+        ordering = [f"{prefix}{attname}", *ordering[1:]]
+        # Cursors skip or repeat rows sharing the leading value unless their
+        # order is stable.
+        pk = queryset.model._meta.pk
+        tiebreakers = {"pk", pk.name, pk.attname}
+        if not unique(queryset.model, name) and not any(
+            o.lstrip("-") in tiebreakers for o in ordering[1:]
+        ):
+            ordering.append(f"{prefix}pk")
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        ordering = None
+        if self.limit_offset.offset_query_param not in params:
+            ordering = self.get_keyset_ordering(queryset)
+        if ordering is None:
+            self.paginator = self.limit_offset
+        else:
+            self.paginator = KeysetPagination(ordering)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        schema = self.limit_offset.get_paginated_response_schema(schema)
+        schema["properties"]["count"]["nullable"] = True
+        return schema
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_results(self, data):
+        return self.paginator.get_results(data)
+
+    def get_schema_fields(self, view):
+        fields = {f.name: f for f in self.limit_offset.get_schema_fields(view)}
+        for field in self.keyset.get_schema_fields(view):
+            fields.setdefault(field.name, field)
+        return list(fields.values())
+
+    def get_schema_operation_parameters(self, view):
+        parameters = OrderedDict()
+        for paginator in (self.limit_offset, self.keyset):
+            for parameter in paginator.get_schema_operation_parameters(view):
+                parameters.setdefault(parameter["name"], parameter)
+        for parameter in self.limit_offset.get_count_schema_operation_parameters(view):
+            parameters.setdefault(parameter["name"], parameter)
+        return list(parameters.values())
@@ -0,0 +1,102 @@
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.urls.resolvers import (
+    RegexPattern,
+    Resolver404,
+    RoutePattern,
+    URLResolver,
+)
+
+
+class PrefixResolver(URLResolver):
+    """
+    URL resolver dispatching on the first path segment.
+
+    Patterns starting with a literal segment like ``^label/`` are grouped by
+    that segment so resolving a path only tries the patterns that can match
+    it, together with all patterns without a literal prefix in their original
+    order. Results are kept in a LRU cache of ``URL_RESOLVE_CACHE_SIZE``
+    paths.
+
+    As the resolver has neither a namespace nor an app name, ``reverse()``
+    works exactly as if the patterns were included directly.
+    """
+
+    literal = re.compile(r"^\^?(?P<segment>[\w-]+)/(?![?*+{])")
+
+    def __init__(self, urlpatterns, maxsize=None):
+        super().__init__(RoutePattern(""), urlpatterns)
+        if maxsize is None:
+            maxsize = getattr(settings, "URL_RESOLVE_CACHE_SIZE", 1024)
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self._resolvers = None
+
+    def segment(self, pattern):
+        pattern = pattern.pattern
+        if isinstance(pattern, RegexPattern):
+            route = pattern._regex
+            if not route.startswith("^"):
+                return None
+        elif isinstance(pattern, RoutePattern):
+            route = pattern._route
+        else:
+            return None
+        match = self.literal.match(route)
+        if match is None:
+            return None
+        return match.group("segment")
+
+    @property
+    def resolvers(self):
+        if self._resolvers is None:
+            segments = dict()
+            fallback = list()
+            for index, pattern in enumerate(self.url_patterns):
+                segment = self.segment(pattern)
+                if segment is None:
+                    fallback.append((index, pattern))
+                else:
+                    segments.setdefault(segment, list()).append((index, pattern))
+            resolvers = {
+                segment: URLResolver(
+                    self.pattern,
+                    [p for _, p in sorted(patterns + fallback, key=lambda x: x[0])],
+                )
+                for segment, patterns in segments.items()
+            }
+            resolvers[None] = URLResolver(self.pattern, [p for _, p in fallback])
+            self._resolvers = resolvers
+        return self._resolvers
+
+    def dispatch(self, path):
+        match = self.pattern.match(path)
+        if not match:
+            raise Resolver404({"path": path})
+        segment, _, _ = match[0].partition("/")
+        resolvers = self.resolvers
+        return resolvers.get(segment, resolvers[None]).resolve(path)
+
+    def resolve(self, path):
+        path = str(path)
+        with self.lock:
+            result = self.cache.get(path)
+            if result is not None:
+                self.cache.move_to_end(path)
+        if result is None:
+            try:
+                result = self.dispatch(path)
+            except Resolver404 as e:
+                result = e
+            if self.maxsize:
+                with self.lock:
+                    self.cache[path] = result
+                    if len(self.cache) > self.maxsize:
+                        self.cache.popitem(last=False)
+        if isinstance(result, Resolver404):
+            raise Resolver404(*result.args)
+        return result
@@ -0,0 +1,224 @@
+"""
+Registry of the channels routes provided by installed apps.
+
+Discovering routes means importing ``<app>.channels`` for every installed
+app. The result is kept in a JSON manifest (``ASGI_CHANNELS_MANIFEST``) so
+later boots can set up the routers without importing anything, while the
+consumers themselves are only imported once their route matches first.
+Apps whose routes can not be described in the manifest are imported eagerly.
+The manifest is discarded once the installed apps or the sources of any of
+their ``channels`` modules or packages change.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from importlib import import_module
+from importlib.util import find_spec
+
+from django.apps import apps
+from django.conf import settings
+from django.urls import (
+    path,
+    re_path,
+)
+from django.urls.resolvers import (
+    RegexPattern,
+    RoutePattern,
+)
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class LazyConsumer:
+    """
+    ASGI application importing its consumer class on first use.
+    """
+
+    def __init__(self, consumer, initkwargs=None):
+        self.consumer = consumer
+        self.initkwargs = initkwargs or dict()
+        self.app = None
+
+    async def __call__(self, scope, receive, send):
+        if self.app is None:
+            self.app = import_string(self.consumer).as_asgi(**self.initkwargs)
+        return await self.app(scope, receive, send)
+
+
+def describe_consumer(app):
+    consumer = getattr(app, "consumer_class", None)
+    if consumer is None:
+        raise ValueError(f"{app!r} is not a consumer application")
+    return {
+        "consumer": f"{consumer.__module__}.{consumer.__qualname__}",
+        "initkwargs": getattr(app, "consumer_initkwargs", dict()),
+    }
+
+
+def describe(module):
+    routes = list()
+    for route in getattr(module, "urls", []):
+        if isinstance(route.pattern, RoutePattern):
+            kind = "path"
+        elif isinstance(route.pattern, RegexPattern):
+            kind = "re_path"
+        else:
+            raise ValueError(f"Unsupported route {route!r}")
+        routes.append(
+            dict(
+                describe_consumer(route.callback),
+                kind=kind,
+                pattern=str(route.pattern),
+                kwargs=route.default_args,
+                name=route.name,
+            )
+        )
+    worker = {
+        channel: describe_consumer(app)
+        for channel, app in getattr(module, "worker", {}).items()
+    }
+    description = {"urls": routes, "worker": worker}
+    # Make sure the description survives a round trip through the manifest.
+    json.dumps(description)
+    return description
+
+
+def sources(spec):
+    """
+    Return the source files of the module ``spec``, all Python files below it
+    for a package.
+    """
+    if spec.submodule_search_locations is None:
+        return [spec.origin]
+    files = list()
+    for location in spec.submodule_search_locations:
+        for root, dirs, names in os.walk(location):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            files.extend(
+                os.path.join(root, name)
+                for name in sorted(names)
+                if name.endswith(".py")
+            )
+    return files
+
+
+def fingerprint():
+    """
+    Map the names of all installed apps to a digest of the sources of their
+    ``channels`` module or package, or ``None`` if they have none, without
+    importing any of them.
+    """
+    digests = dict()
+    for app in sorted(apps.get_app_configs(), key=lambda app: app.label):
+        try:
+            spec = find_spec(f"{app.name}.channels")
+        except (ImportError, ValueError):
+            spec = None
+        digest = None
+        if spec is not None and spec.has_location:
+            h = hashlib.sha256()
+            try:
+                for source in sources(spec):
+                    h.update(source.encode())
+                    with open(source, "rb") as f:
+                        h.update(f.read())
+                digest = h.hexdigest()
+            except OSError:
+                pass
+        digests[app.name] = digest
+    return digests
+
+
+def discover():
+    modules = dict()
+    for app in sorted(apps.get_app_configs(), key=lambda app: app.label):
+        name = f"{app.name}.channels"
+        start = time.perf_counter()
+        try:
+            module = import_module(name)
+        except ModuleNotFoundError as e:
+            if e.name != name:
+                logger.warning(f"Failed to import channels from {app.name}: {e}")
+            continue
+        except Exception:
+            logger.warning(f"Failed to import channels from {app.name}", exc_info=True)
+            continue
+        finally:
+            logger.info(
+                f"Looked for channels in {app.name} in "
+                f"{time.perf_counter() - start:.4f}s"
+            )
+        try:
+            modules[app.name] = describe(module)
+        except (AttributeError, TypeError, ValueError) as e:
+            logger.info(f"Importing channels from {app.name} eagerly: {e}")
+            modules[app.name] = None
+    return {"apps": fingerprint(), "modules": modules}
+
+
+def write(manifest):
+    filename = getattr(settings, "ASGI_CHANNELS_MANIFEST", None)
+    if not filename:
+        return
+    # Workers booting at the same time must never read a partial manifest.
+    tmp = f"{filename}.{os.getpid()}"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, filename)
+    except OSError as e:
+        logger.warning(f"Unable to write channels manifest {filename}: {e}")
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def read():
+    filename = getattr(settings, "ASGI_CHANNELS_MANIFEST", None)
+    if not filename:
+        return None
+    try:
+        with open(filename) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("apps") != fingerprint():
+        logger.info("Installed apps or their routes changed, discarding manifest")
+        return None
+    return manifest
+
+
+def load():
+    """
+    Return the ``urls`` and ``worker`` routes of all installed apps.
+    """
+    manifest = read()
+    if manifest is None:
+        manifest = discover()
+        write(manifest)
+    urls = list()
+    worker = dict()
+    for name, description in manifest["modules"].items():
+        if description is None:
+            module = import_module(f"{name}.channels")
+            urls.extend(getattr(module, "urls", []))
+            worker.update(getattr(module, "worker", {}))
+            continue
+        for route in description["urls"]:
+            func = path if route["kind"] == "path" else re_path
+            urls.append(
+                func(
+                    route["pattern"],
+                    LazyConsumer(route["consumer"], route["initkwargs"]),
+                    route["kwargs"],
+                    route["name"],
+                )
+            )
+        for channel, consumer in description["worker"].items():
+            worker[channel] = LazyConsumer(consumer["consumer"], consumer["initkwargs"])
+    return urls, worker
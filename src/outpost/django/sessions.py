@@ -0,0 +1,94 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import (
+    CreateError,
+    UpdateError,
+)
+from django.contrib.sessions.backends.cache import SessionStore as CacheSessionStore
+
+
+class SessionStore(CacheSessionStore):
+    """
+    Cache based session store writing sessions only if their content changed.
+
+    The time of expiry is stored next to the session data. An accessed session
+    is only written again to refresh its expiry once less than
+    ``SESSION_REFRESH_FRACTION`` of its expiry age remains.
+
+    Stores linked with :meth:`link` are loaded from the cache together with
+    a single ``get_many``.
+    """
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self.fingerprint = None
+        self.expires = None
+        self.linked = list()
+
+    def link(self, other):
+        self.linked.append(other)
+        other.linked.append(self)
+
+    def digest(self, data):
+        return hashlib.blake2b(self.serializer().dumps(data)).hexdigest()
+
+    def stale(self, data):
+        if self.expires is None:
+            return True
+        age = self.get_expiry_age(expiry=data.get("_session_expiry"))
+        fraction = getattr(settings, "SESSION_REFRESH_FRACTION", 0.5)
+        return self.expires - time.time() < age * fraction
+
+    def restore(self, value):
+        if value is None:
+            self._session_key = None
+            return {}
+        if isinstance(value, tuple):
+            data, self.expires = value
+        else:
+            # Written by the cache session store, refresh it in our format.
+            data, self.expires = value, None
+        self.fingerprint = self.digest(data)
+        if data and self.stale(data):
+            self.modified = True
+        return data
+
+    def load(self):
+        stores = [self] + [
+            store
+            for store in self.linked
+            if store.session_key is not None and not hasattr(store, "_session_cache")
+        ]
+        keys = [store.cache_key for store in stores]
+        try:
+            values = self._cache.get_many(keys)
+        except Exception:
+            # Some backends (e.g. memcache) raise an exception on invalid
+            # cache keys. If this happens, reset the session.
+            values = dict()
+        for store, key in zip(stores[1:], keys[1:]):
+            store._session_cache = store.restore(values.get(key))
+        return self.restore(values.get(keys[0]))
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        fingerprint = self.digest(data)
+        if not must_create and fingerprint == self.fingerprint and not self.stale(data):
+            return
+        if must_create:
+            func = self._cache.add
+        elif self._cache.get(self.cache_key) is not None:
+            func = self._cache.set
+        else:
+            raise UpdateError
+        age = self.get_expiry_age()
+        expires = time.time() + age
+        result = func(self.cache_key, (data, expires), age)
+        if must_create and not result:
+            raise CreateError
+        self.fingerprint = fingerprint
+        self.expires = expires
@@ -3,24 +3,59 @@ Django settings for Outpost project.
 """
 
 import os
+from functools import lru_cache
+from importlib.util import find_spec
 
-import graypy
-import ldap
-import pint
-import saml2
-import saml2.attributemaps
-import saml2.saml
 from corsheaders.defaults import default_methods
+from django.utils.functional import SimpleLazyObject
 from django.utils.translation import ugettext_lazy as _
-from django_auth_ldap.config import (
-    GroupOfNamesType,
-    LDAPSearch,
-)
-from docutils.core import publish_parts
-from geopy.geocoders import Nominatim
-from markdown2 import Markdown
 
-ureg = pint.UnitRegistry()
+# Constants of saml2, spelled out to avoid importing them on startup.
+SAML2_BINDING_HTTP_POST = "urn:oasis:names:tc:SAML:2.0:bindings:HTTP-POST"
+SAML2_BINDING_HTTP_REDIRECT = "urn:oasis:names:tc:SAML:2.0:bindings:HTTP-Redirect"
+SAML2_NAMEID_FORMAT_PERSISTENT = "urn:oasis:names:tc:SAML:2.0:nameid-format:persistent"
+
+
+def ldap_search(base, filterstr):
+    def search():
+        import ldap
+        from django_auth_ldap.config import LDAPSearch
+
+        return LDAPSearch(base, ldap.SCOPE_SUBTREE, filterstr)
+
+    return SimpleLazyObject(search)
+
+
+def ldap_group_type(name, **kwargs):
+    def group_type():
+        from django_auth_ldap import config
+
+        return getattr(config, name)(**kwargs)
+
+    return SimpleLazyObject(group_type)
+
+
+@lru_cache(maxsize=None)
+def markdown():
+    from markdown2 import Markdown
+
+    return Markdown()
+
+
+def restructuredtext(markup):
+    from docutils.core import publish_parts
+
+    return publish_parts(source=markup, writer_name="html5").get("body", "")
+
+
+def nominatim(**kwargs):
+    def geocoder():
+        from geopy.geocoders import Nominatim
+
+        return Nominatim(**kwargs)
+
+    return SimpleLazyObject(geocoder)
+
 
 BASE_DIR = os.path.abspath(os.path.join(__file__, "../../../.."))
 
@@ -47,6 +82,7 @@ INSTALLED_APPS = [
     "django.contrib.humanize",
     "django.contrib.sessions",
     "django.contrib.messages",
+    "outpost.django.apps.OutpostConfig",
     "django.contrib.staticfiles",
     "django.contrib.postgres",
     "django.contrib.gis",
@@ -100,7 +136,7 @@ MIDDLEWARE = [
     "corsheaders.middleware.CorsPostCsrfMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "oauth2_provider.middleware.OAuth2TokenMiddleware",
-    "djangosaml2.middleware.SamlSessionMiddleware",
+    f"{__package__}.middleware.SamlSessionMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.contrib.sites.middleware.CurrentSiteMiddleware",
     # 'django_downloadview.SmartDownloadMiddleware',
@@ -108,6 +144,7 @@ MIDDLEWARE = [
 ]
 
 ROOT_URLCONF = "outpost.django.urls"
+URL_RESOLVE_CACHE_SIZE = 1024
 
 TEMPLATES = [
     {
@@ -128,6 +165,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "outpost.django.wsgi.application"
 ASGI_APPLICATION = "outpost.django.asgi.application"
+ASGI_NATIVE_HTTP = False
+ASGI_THREADS = 10
+ASGI_CHANNELS_MANIFEST = os.path.join(BASE_DIR, "channels.json")
 
 DATABASES = {
     "default": {
@@ -137,8 +177,36 @@ DATABASES = {
 }
 
 CACHES = {
-    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
-    "meduniverse": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    "default": {
+        "BACKEND": f"{__package__}.cache.TieredCache",
+        "OPTIONS": {
+            "SHARED": {
+                "BACKEND": "django_redis.cache.RedisCache",
+                "LOCATION": "redis://localhost:6379/1",
+            },
+            "LOCAL": {"TIMEOUT": 60, "OPTIONS": {"MAX_ENTRIES": 1000}},
+            "CHANNEL_LAYER": "default",
+            "GROUP": "outpost.cache.default",
+        },
+    },
+    "meduniverse": {
+        "BACKEND": f"{__package__}.cache.TieredCache",
+        "OPTIONS": {
+            "SHARED": {
+                "BACKEND": "django_redis.cache.RedisCache",
+                "LOCATION": "redis://localhost:6379/2",
+            },
+            "LOCAL": {"TIMEOUT": 60, "OPTIONS": {"MAX_ENTRIES": 1000}},
+            "CHANNEL_LAYER": "default",
+            "GROUP": "outpost.cache.meduniverse",
+        },
+    },
+    # Sessions must not be served from a per-process copy after they were
+    # changed or deleted by another process.
+    "sessions": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "redis://localhost:6379/1",
+    },
 }
 
 CHANNEL_LAYERS = {
@@ -148,8 +216,9 @@ CHANNEL_LAYERS = {
     }
 }
 
-SESSION_ENGINE = "django.contrib.sessions.backends.cache"
-SESSION_CACHE_ALIAS = "default"
+SESSION_ENGINE = f"{__package__}.sessions"
+SESSION_REFRESH_FRACTION = 0.5
+SESSION_CACHE_ALIAS = "sessions"
 SESSION_COOKIE_SECURE = True
 SESSION_COOKIE_HTTPONLY = True
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
@@ -183,6 +252,9 @@ SYSTEM_STATIC_PATHS = {
     "jsrender/": ("/usr/share/javascript/jsrender",),
     "pikaday/": ("/usr/share/nodejs/pikaday",),
 }
+SYSTEM_STATIC_INDEX = False
+SYSTEM_STATIC_INDEX_INTERVAL = 60
+SYSTEM_STATIC_MANIFEST = os.path.join(BASE_DIR, "collectstatic.json")
 
 
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
@@ -191,9 +263,11 @@ STATIC_URL = "/static/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 MEDIA_URL = "/media/"
 
-FILE_UPLOAD_HANDLERS = ["django.core.files.uploadhandler.TemporaryFileUploadHandler"]
+FILE_UPLOAD_HANDLERS = [f"{__package__}.files.HashingFileUploadHandler"]
 FILE_UPLOAD_PERMISSIONS = 0o664
-DATA_UPLOAD_MAX_MEMORY_SIZE = int(ureg("512MB").to("bytes").magnitude)
+UPLOAD_SHARD_DEPTH = 0
+# 512MB
+DATA_UPLOAD_MAX_MEMORY_SIZE = 512 * 1000 ** 2
 DATA_UPLOAD_MAX_NUMBER_FIELDS = None
 
 CONSTANCE_BACKEND = "constance.backends.database.DatabaseBackend"
@@ -238,6 +312,12 @@ COMPRESS_PRECOMPILERS = [
     ("text/less", "outpost.django.compressor.DjangoLessFilter"),
     ("text/x-scss", "outpost.django.compressor.DjangoSassCompiler"),
 ]
+COMPRESS_LESS_WORKERS = 0
+COMPRESS_LESS_TIMEOUT = 60
+COMPRESS_SASS_IMPORT_CACHE_SIZE = 256
+COMPRESS_SASS_IMPORT_CACHE_TIMEOUT = 60
+COMPRESS_SASS_CACHE_DIR = os.path.join(BASE_DIR, "sass")
+COMPRESS_SASS_CACHE_MAX_AGE = 30 * 86400
 
 LOGIN_URL = "accounts:login"
 LOGIN_REDIRECT_URL = "base:index"
@@ -245,31 +325,33 @@ LOGOUT_REDIRECT_URL = "/"
 
 SAML_CREATE_UNKNOWN_USER = True
 SAML_ATTRIBUTE_MAPPING = {"uid": ("username",)}
-SAML_LOGOUT_REQUEST_PREFERRED_BINDING = saml2.BINDING_HTTP_POST
+SAML_LOGOUT_REQUEST_PREFERRED_BINDING = SAML2_BINDING_HTTP_POST
 SAML_CONFIG = {
     # full path to the xmlsec1 binary programm
     "xmlsec_binary": "/usr/bin/xmlsec1",
     # your entity id, usually your subdomain plus the url to the metadata view
     "entityid": "http://localhost:8000/saml2/metadata/",
     # directory with attribute mapping
-    "attribute_map_dir": os.path.dirname(saml2.attributemaps.__file__),
+    "attribute_map_dir": os.path.join(
+        find_spec("saml2").submodule_search_locations[0], "attributemaps"
+    ),
     # this block states what services we provide
     "service": {
         # we are just a lonely SP
         "sp": {
             "name": "Federated Django sample SP",
-            "name_id_format": saml2.saml.NAMEID_FORMAT_PERSISTENT,
+            "name_id_format": SAML2_NAMEID_FORMAT_PERSISTENT,
             "endpoints": {
                 # url and binding to the assetion consumer service view
                 # do not change the binding or service name
                 "assertion_consumer_service": [
-                    ("http://localhost:8000/saml2/acs/", saml2.BINDING_HTTP_POST)
+                    ("http://localhost:8000/saml2/acs/", SAML2_BINDING_HTTP_POST)
                 ],
                 # url and binding to the single logout service view
                 # do not change the binding or service name
                 "single_logout_service": [
-                    ("http://localhost:8000/saml2/ls/", saml2.BINDING_HTTP_REDIRECT),
-                    ("http://localhost:8000/saml2/ls/post", saml2.BINDING_HTTP_POST),
+                    ("http://localhost:8000/saml2/ls/", SAML2_BINDING_HTTP_REDIRECT),
+                    ("http://localhost:8000/saml2/ls/post", SAML2_BINDING_HTTP_POST),
                 ],
             },
             # attributes that this project need to identify a user
@@ -284,10 +366,10 @@ SAML_CONFIG = {
                 # the keys of this dictionary are entity ids
                 "https://localhost/simplesaml/saml2/idp/metadata.php": {
                     "single_sign_on_service": {
-                        saml2.BINDING_HTTP_REDIRECT: "https://localhost/simplesaml/saml2/idp/SSOService.php"
+                        SAML2_BINDING_HTTP_REDIRECT: "https://localhost/simplesaml/saml2/idp/SSOService.php"
                     },
                     "single_logout_service": {
-                        saml2.BINDING_HTTP_REDIRECT: "https://localhost/simplesaml/saml2/idp/SingleLogoutService.php"
+                        SAML2_BINDING_HTTP_REDIRECT: "https://localhost/simplesaml/saml2/idp/SingleLogoutService.php"
                     },
                 }
             },
@@ -359,15 +441,11 @@ AUTH_PASSWORD_VALIDATORS = [
 AUTH_LDAP_SERVER_URI = "ldap://ldap.example.com"
 AUTH_LDAP_BIND_DN = "cn=django-agent,dc=example,dc=com"
 AUTH_LDAP_BIND_PASSWORD = "phlebotinum"
-AUTH_LDAP_USER_SEARCH = LDAPSearch(
-    "ou=users,dc=example,dc=com", ldap.SCOPE_SUBTREE, "(uid=%(user)s)"
+AUTH_LDAP_USER_SEARCH = ldap_search("ou=users,dc=example,dc=com", "(uid=%(user)s)")
+AUTH_LDAP_GROUP_SEARCH = ldap_search(
+    "ou=django,ou=groups,dc=example,dc=com", "(objectClass=groupOfNames)"
 )
-AUTH_LDAP_GROUP_SEARCH = LDAPSearch(
-    "ou=django,ou=groups,dc=example,dc=com",
-    ldap.SCOPE_SUBTREE,
-    "(objectClass=groupOfNames)",
-)
-AUTH_LDAP_GROUP_TYPE = GroupOfNamesType(name_attr="cn")
+AUTH_LDAP_GROUP_TYPE = ldap_group_type("GroupOfNamesType", name_attr="cn")
 AUTH_LDAP_REQUIRE_GROUP = "cn=enabled,ou=django,ou=groups,dc=example,dc=com"
 AUTH_LDAP_DENY_GROUP = "cn=disabled,ou=django,ou=groups,dc=example,dc=com"
 AUTH_LDAP_USER_ATTR_MAP = {
@@ -399,7 +477,7 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ),
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
+    "DEFAULT_PAGINATION_CLASS": f"{__package__}.pagination.Pagination",
     "PAGE_SIZE": 20,
     "DEFAULT_FILTER_BACKENDS": ("django_filters.rest_framework.DjangoFilterBackend",),
     "DEFAULT_VERSIONING_CLASS": "rest_framework.versioning.NamespaceVersioning",
@@ -408,6 +486,10 @@ REST_FRAMEWORK = {
     "HTML_SELECT_CUTOFF": 200,
 }
 
+PAGINATION_COUNT = "exact"
+PAGINATION_COUNT_THRESHOLD = 10000
+EXPORT_CHUNK_SIZE = 2000
+
 REST_FRAMEWORK_EXTENSIONS = {"DEFAULT_CACHE_RESPONSE_TIMEOUT": 3600}
 
 SPECTACULAR_SETTINGS = {
@@ -461,13 +543,8 @@ CORS_ALLOW_METHODS = default_methods + (
 DEFAULT_SRID = 3857
 
 MARKUP_FIELD_TYPES = [
-    ("markdown", Markdown().convert),
-    (
-        "ReST",
-        lambda markup: publish_parts(source=markup, writer_name="html5").get(
-            "body", ""
-        ),
-    ),
+    ("markdown", lambda markup: markdown().convert(markup)),
+    ("ReST", restructuredtext),
 ]
 
 DOWNLOADVIEW_BACKEND = "django_downloadview.apache.XSendfileMiddleware"
@@ -493,7 +570,7 @@ HOOK_EVENTS = {}
 
 RUNSERVERPLUS_SERVER_ADDRESS_PORT = "0.0.0.0:8088"
 
-GEORESOLVERS = (Nominatim(user_agent=__package__),)
+GEORESOLVERS = (nominatim(user_agent=__package__),)
 
 OUTPOST = {
     "epiphan_provisioning": False,
@@ -516,6 +593,13 @@ LOGGING = {
             "()": f"{__package__}.logging.StaticFieldFilter",
             "fields": {"project": "development"},
         },
+        "rate_limit": {
+            "()": f"{__package__}.logging.RateLimitFilter",
+            "rate": 1.0,
+            "burst": 10,
+            "maxsize": 1000,
+            "interval": 60,
+        },
     },
     "handlers": {
         "console": {
@@ -530,12 +614,14 @@ LOGGING = {
         },
         "graylog": {
             "level": "WARNING",
-            "class": "graypy.GELFUDPHandler"
-            if getattr(graypy, "__version__", tuple()) >= (1, 1, 3)
-            else "graypy.GELFHandler",
+            "()": f"{__package__}.logging.BackgroundHandler",
+            # graypy before 1.1.3 only provides GELFHandler.
+            "handler": ("graypy.GELFUDPHandler", "graypy.GELFHandler"),
+            "capacity": 10000,
+            "batch_size": 100,
             "host": "localhost",
             "port": 12201,
-            "filters": ["static_fields"],
+            "filters": ["rate_limit", "static_fields"],
         },
     },
     "loggers": {
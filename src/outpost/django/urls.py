@@ -18,6 +18,9 @@ from django.views.i18n import JavaScriptCatalog
 from django.views.static import serve
 from rest_framework.authtoken import views as authtoken
 
+from . import metrics
+from .resolvers import PrefixResolver
+
 logger = logging.getLogger(__name__)
 
 js_info_dict = {
@@ -47,7 +50,12 @@ urlpatterns.extend(
         url(r"^admin/", admin.site.urls),
         url(r"^jsi18n/$", JavaScriptCatalog.as_view(), js_info_dict),
         url(r"^auth/api/", include("rest_framework.urls", namespace="rest_framework")),
-        url(r"^prometheus/", include("django_prometheus.urls")),
+        url(
+            r"^prometheus/",
+            include(
+                [path("metrics", metrics.export, name="prometheus-django-metrics")]
+            ),
+        ),
         path("ckeditor/", include("ckeditor_uploader.urls")),
         url(r"^auth/token/", authtoken.obtain_auth_token),
         url(
@@ -82,3 +90,5 @@ urlpatterns.extend(
         ),
     ]
 )
+
+urlpatterns = [PrefixResolver(urlpatterns)]
@@ -1,22 +1,122 @@
+import ipaddress
 import locale
+import threading
 from base64 import urlsafe_b64encode
+from bisect import bisect_right
+from collections import defaultdict
 from pathlib import PurePosixPath
 from uuid import uuid4
 
+from django.conf import settings
 from IPy import IP
 
+try:
+    import icu
+except ImportError:
+    icu = None
+
 
 class IPList(list):
+    """
+    List of networks supporting fast membership tests.
+
+    Membership is answered from a compiled index of sorted, merged integer
+    intervals per IP version using bisection. The index is built on first
+    use and discarded whenever the list is modified.
+    """
+
     def __init__(self, addresses):
         super(IPList, self).__init__()
         for address in addresses:
             self.append(IP(address))
 
+    def compile(self):
+        intervals = {4: [], 6: []}
+        for net in sorted(map(IP, self), key=lambda n: (n.version(), n.int())):
+            start = net.int()
+            end = start + net.len() - 1
+            current = intervals[net.version()]
+            if current and start <= current[-1][1]:
+                current[-1][1] = max(current[-1][1], end)
+            else:
+                current.append([start, end])
+        return {
+            version: ([s for s, _ in current], [e for _, e in current])
+            for version, current in intervals.items()
+        }
+
+    @property
+    def index(self):
+        index = getattr(self, "_index", None)
+        if index is None:
+            index = self._index = self.compile()
+        return index
+
+    @staticmethod
+    def _range(address):
+        if isinstance(address, str):
+            try:
+                address = ipaddress.ip_address(address)
+            except ValueError:
+                pass
+            else:
+                return address.version, int(address), int(address)
+        if not isinstance(address, IP):
+            address = IP(address)
+        start = address.int()
+        return address.version(), start, start + address.len() - 1
+
+    def _lookup(self, index, address):
+        version, start, end = self._range(address)
+        starts, ends = index[version]
+        i = bisect_right(starts, start) - 1
+        return i >= 0 and end <= ends[i]
+
     def __contains__(self, address):
-        for net in self:
-            if address in net:
-                return True
-        return False
+        return self._lookup(self.index, address)
+
+    def contains_many(self, addresses):
+        index = self.index
+        return [self._lookup(index, address) for address in addresses]
+
+    def _invalidate(self):
+        self._index = None
+
+    def append(self, item):
+        self._invalidate()
+        super().append(item)
+
+    def extend(self, iterable):
+        self._invalidate()
+        super().extend(iterable)
+
+    def insert(self, i, item):
+        self._invalidate()
+        super().insert(i, item)
+
+    def remove(self, item):
+        self._invalidate()
+        super().remove(item)
+
+    def pop(self, *args):
+        self._invalidate()
+        return super().pop(*args)
+
+    def clear(self):
+        self._invalidate()
+        super().clear()
+
+    def __setitem__(self, key, value):
+        self._invalidate()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._invalidate()
+        super().__delitem__(key)
+
+    def __iadd__(self, other):
+        self._invalidate()
+        return super().__iadd__(other)
 
 
 class LocaleManager:
@@ -31,9 +131,86 @@ class LocaleManager:
         locale.setlocale(locale.LC_ALL, self.orig)
 
 
+class Collation:
+    """
+    Locale aware collation that leaves the process wide locale untouched.
+
+    Sort keys are computed by ICU if PyICU is installed, using one collator
+    per thread and locale. Otherwise they are derived from
+    :func:`locale.strxfrm` while ``LC_COLLATE`` is switched under a lock for
+    just as long as it takes to transform all missing values. Keys are cached
+    per locale, so recurring values like person or room names are only ever
+    transformed once and lookups do not need any locking.
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.caches = defaultdict(dict)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def collator(self, localename):
+        collators = self.local.__dict__.setdefault("collators", dict())
+        if localename not in collators:
+            collators[localename] = icu.Collator.createInstance(
+                icu.Locale(localename.split(".")[0])
+            )
+        return collators[localename]
+
+    def transform(self, values, localename):
+        if icu is not None:
+            collator = self.collator(localename)
+            return [collator.getSortKey(v) for v in values]
+        with self.lock:
+            orig = locale.setlocale(locale.LC_COLLATE)
+            locale.setlocale(locale.LC_COLLATE, localename)
+            try:
+                return [locale.strxfrm(v) for v in values]
+            finally:
+                locale.setlocale(locale.LC_COLLATE, orig)
+
+    def sort_keys(self, iterable, localename):
+        values = list(iterable)
+        cache = self.caches[localename]
+        missing = [v for v in set(values) if v not in cache]
+        if missing:
+            if len(cache) + len(missing) > self.maxsize:
+                cache = self.caches[localename] = dict()
+            cache.update(zip(missing, self.transform(missing, localename)))
+        return [cache[v] for v in values]
+
+    def sort_key(self, value, localename):
+        return self.sort_keys((value,), localename)[0]
+
+    def sorted(self, iterable, localename, key=None, reverse=False):
+        items = list(iterable)
+        keys = self.sort_keys(map(key, items) if key else items, localename)
+        order = sorted(range(len(items)), key=keys.__getitem__, reverse=reverse)
+        return [items[i] for i in order]
+
+
+collation = Collation()
+
+
 class Uuid4Upload(str):
+    """
+    Upload path of the form ``<module>/<ObjectName>/<uuid>.<suffix>``.
+
+    If ``UPLOAD_SHARD_DEPTH`` is set, that many directory levels of two
+    characters each taken from the encoded UUID are inserted before the file
+    name to keep directories small.
+    """
+
     def __new__(cls, instance, filename):
         f = PurePosixPath(filename)
         u = urlsafe_b64encode(uuid4().bytes).decode("ascii").rstrip("=")
-        p = PurePosixPath(instance.__module__, instance._meta.object_name)
+        p = PurePosixPath(
+            instance.__module__, instance._meta.object_name, *cls.shards(u)
+        )
         return str.__new__(cls, p.joinpath(u).with_suffix(f.suffix))
+
+    @staticmethod
+    def shards(name, depth=None):
+        if depth is None:
+            depth = getattr(settings, "UPLOAD_SHARD_DEPTH", 0)
+        return [name[i * 2 : (i + 1) * 2] for i in range(depth)]